@@ -1,25 +1,403 @@
-from collections import defaultdict
+import asyncio
+import dataclasses
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor, wait
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, Tuple, Type, Optional, List, Iterable, Set
 
+# listeners connected to ANY receive all events
+ANY = object
 
-class Dispatcher:
-    def __init__(self):
-        self._listeners = defaultdict(list)
+# execution policies of Dispatcher listeners
+INLINE = 'inline'
+THREAD = 'thread'
+PROCESS = 'process'
+POLICIES = (INLINE, THREAD, PROCESS)
 
-    def emit(self, event):
-        for listener in self._listeners[type(event)]:
-            listener(event)
 
-    def connect(self, event_type, listener):
-        self._listeners[event_type].append(listener)
+class _BaseDispatcher:
+    """
+    Listeners are registered for a type and receive events of this type and its subclasses, in order of connection.
+    The flattened listeners per event type are cached and rebuilt lazily after `connect` and `disconnect`.
+    """
 
+    _async = False
 
-class AsyncDispatcher:
     def __init__(self):
-        self._listeners = defaultdict(list)
+        self._registrations: Tuple[Tuple[Type, Callable], ...] = ()
+        self._table: Dict[Type, Tuple[Callable, ...]] = {}
+        self._profiler: Optional['ListenerProfiler'] = None
+
+    def connect(self, event_type, listener):
+        self._registrations += ((event_type, listener),)
+        # replaced instead of cleared, so a concurrent lookup can not store a stale entry
+        self._table = {}
+
+    def disconnect(self, event_type, listener):
+        registrations = list(self._registrations)
+        registrations.remove((event_type, listener))
+        self._registrations = tuple(registrations)
+        self._table = {}
+
+    def listeners(self, event_type) -> Tuple[Callable, ...]:
+        table = self._table
+        listeners = table.get(event_type)
+        if listeners is None:
+            listeners = tuple(listener for _type, listener in self._registrations if issubclass(event_type, _type))
+            profiler = self._profiler
+            if profiler is not None:
+                listeners = tuple(profiler.wrap(event_type, listener, self._async) for listener in listeners)
+            table[event_type] = listeners
+        return listeners
+
+
+class _Submitted:
+    """
+    Listener, which runs in an executor of the dispatcher. Compares equal to the wrapped listener for `disconnect`.
+    """
+    __slots__ = ('dispatcher', 'listener', 'policy')
+
+    def __init__(self, dispatcher: 'Dispatcher', listener: Callable, policy: str):
+        self.dispatcher = dispatcher
+        self.listener = listener
+        self.policy = policy
+
+    def __call__(self, event, collect: bool = True) -> Future:
+        return self.dispatcher._submit(self.policy, self.listener, event, collect)
+
+    def __eq__(self, other):
+        return self.listener == (other.listener if isinstance(other, _Submitted) else other)
+
+    def __hash__(self):
+        return hash(self.listener)
+
+
+class Dispatcher(_BaseDispatcher):
+    """
+    Listeners run on the emitting thread (INLINE), in a thread pool (THREAD)
+    or in a process pool (PROCESS, listener and event have to be picklable), see `connect`.
+
+    Errors of listeners in executors are collected and returned by `flush`,
+    which waits for all outstanding listeners, e.g. at the end of a frame.
+    The error raised by `emit(wait=True)` is not collected again.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        super().__init__()
+        self.max_workers = max_workers
+        self._executors: Dict[str, Executor] = {}
+        self._pending: Set[Future] = set()
+        self._errors: List[BaseException] = []
+        self._lock = Lock()
+
+    def connect(self, event_type, listener, policy: str = INLINE):
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown policy {policy}, use one of {POLICIES}')
+        if policy != INLINE:
+            listener = _Submitted(self, listener, policy)
+        super().connect(event_type, listener)
+
+    def emit(self, event, wait: bool = False):
+        """
+        With `wait` blocks until listeners in executors finished and raises their first error,
+        further errors are returned by the next `flush`.
+        """
+        listeners = self._table.get(type(event))
+        if listeners is None:
+            listeners = self.listeners(type(event))
+        if not wait:
+            for listener in listeners:
+                listener(event)
+            return
+
+        futures = []
+        for listener in listeners:
+            if isinstance(listener, _Submitted):
+                futures.append(listener(event, False))
+            else:
+                listener(event)
+        errors = [error for error in (future.exception() for future in futures) if error is not None]
+        if errors:
+            with self._lock:
+                self._errors.extend(errors[1:])
+            raise errors[0]
+
+    def _executor(self, policy: str) -> Executor:
+        executor = self._executors.get(policy)
+        if executor is None:
+            with self._lock:
+                executor = self._executors.get(policy)
+                if executor is None:
+                    pool = ThreadPoolExecutor if policy == THREAD else ProcessPoolExecutor
+                    executor = self._executors[policy] = pool(self.max_workers)
+        return executor
+
+    def _submit(self, policy: str, listener: Callable, event, collect: bool = True) -> Future:
+        """
+        Errors of the listener are collected for `flush`, unless the caller handles them (`collect` False).
+        """
+        future = self._executor(policy).submit(listener, event)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done if collect else self._forget)
+        return future
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+            if not future.cancelled() and future.exception() is not None:
+                self._errors.append(future.exception())
+
+    def _forget(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def flush(self, timeout: Optional[float] = None) -> List[BaseException]:
+        """
+        Waits for outstanding listeners in executors, returns and clears the collected errors.
+        """
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout)
+        with self._lock:
+            errors, self._errors = self._errors, []
+        return errors
+
+    def close(self, wait: bool = True):
+        for executor in self._executors.values():
+            executor.shutdown(wait)
+        self._executors.clear()
+
+
+class AsyncDispatcher(_BaseDispatcher):
+    """
+    By default listeners are awaited one after another.
+    With `concurrent` the listeners of an event run concurrently, at most `max_concurrency` at a time,
+    errors are raised after all listeners finished. `timeout` limits the time of each listener call.
+
+    Batch listeners (`connect_batch`) receive lists of events from `emit_many`,
+    `post` queues events, which are delivered as one batch by `flush` (or periodically by `run`).
+    """
+
+    _async = True
+
+    def __init__(self, concurrent: bool = False, max_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        super().__init__()
+        self.concurrent = concurrent
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._batch = _BaseDispatcher()
+        self._queue: List = []
 
     async def emit(self, event):
-        for l in self._listeners[type(event)]:
-            await l(event)
+        listeners = self._table.get(type(event))
+        if listeners is None:
+            listeners = self.listeners(type(event))
+        if self.concurrent:
+            await self._gather([self._call(l, event) for l in listeners])
+        elif self.timeout is None:
+            for l in listeners:
+                await l(event)
+        else:
+            for l in listeners:
+                await asyncio.wait_for(l(event), self.timeout)
 
-    def connect(self, event_type, listener):
-        self._listeners[event_type].append(listener)
+    async def _call(self, listener, arg):
+        if self.max_concurrency is None:
+            await self._run(listener, arg)
+            return
+        if self._semaphore is None:
+            # created lazily within the running loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            await self._run(listener, arg)
+
+    async def _run(self, listener, arg):
+        if self.timeout is None:
+            await listener(arg)
+        else:
+            await asyncio.wait_for(listener(arg), self.timeout)
+
+    @staticmethod
+    async def _gather(calls):
+        for result in await asyncio.gather(*calls, return_exceptions=True):
+            if isinstance(result, BaseException):
+                raise result
+
+    # --- batches
+    def connect_batch(self, event_type, listener):
+        self._batch.connect(event_type, listener)
+
+    def disconnect_batch(self, event_type, listener):
+        self._batch.disconnect(event_type, listener)
+
+    async def emit_many(self, events: Iterable):
+        """
+        Emits the events to the listeners, batch listeners are called once with all matching events.
+        """
+        events = list(events)
+        if self._registrations:
+            if self.concurrent:
+                await self._gather([self.emit(event) for event in events])
+            else:
+                for event in events:
+                    await self.emit(event)
+
+        batches: Dict[Callable, List] = {}
+        batch_listeners = self._batch.listeners
+        for event in events:
+            for listener in batch_listeners(type(event)):
+                batch = batches.get(listener)
+                if batch is None:
+                    batches[listener] = [event]
+                else:
+                    batch.append(event)
+
+        if self.concurrent:
+            await self._gather([self._call(listener, batch) for listener, batch in batches.items()])
+        else:
+            for listener, batch in batches.items():
+                await self._run(listener, batch)
+
+    def post(self, event):
+        """
+        Queues the event for the next `flush`.
+        """
+        self._queue.append(event)
+
+    async def flush(self):
+        events, self._queue = self._queue, []
+        if events:
+            await self.emit_many(events)
+
+    async def run(self, interval: float = 0.01):
+        """
+        Flushes queued events every `interval` seconds until cancelled.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+
+@dataclasses.dataclass
+class ListenerStats:
+    """
+    Calls of a listener for one event type, times in seconds.
+    """
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    errors: int = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+class ListenerProfiler:
+    """
+    Opt-in profiling of `Dispatcher` and `AsyncDispatcher` listeners per (event type, listener).
+
+    `attach` rebuilds the dispatch table with measuring wrappers, dispatchers without profiler run unchanged.
+    Listeners in executors are measured until their future completes.
+    `on_slow(event_type, listener, seconds)` is called for calls taking at least `slow_threshold` seconds.
+
+    profiler = ListenerProfiler(slow_threshold=0.005, on_slow=print)
+    profiler.attach(dispatcher)
+    ...
+    for (event_type, listener), stats in profiler.snapshot().items(): ...
+    """
+
+    def __init__(self, slow_threshold: Optional[float] = None,
+                 on_slow: Optional[Callable[[Type, Callable, float], None]] = None):
+        self.slow_threshold = slow_threshold
+        self.on_slow = on_slow
+        self._stats: Dict[Tuple[Type, Callable], ListenerStats] = {}
+        self._lock = Lock()
+
+    def attach(self, dispatcher: _BaseDispatcher):
+        dispatcher._profiler = self
+        dispatcher._table = {}
+        return dispatcher
+
+    @staticmethod
+    def detach(dispatcher: _BaseDispatcher):
+        dispatcher._profiler = None
+        dispatcher._table = {}
+
+    def snapshot(self) -> Dict[Tuple[Type, Callable], ListenerStats]:
+        with self._lock:
+            return {key: dataclasses.replace(stats) for key, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            for stats in self._stats.values():
+                # wrappers keep references to the stats
+                stats.__init__()
+
+    def _record(self, stats: ListenerStats, event_type: Type, listener: Callable, duration: float, error: bool):
+        with self._lock:
+            stats.calls += 1
+            stats.total += duration
+            if duration > stats.max:
+                stats.max = duration
+            if error:
+                stats.errors += 1
+        if self.on_slow is not None and self.slow_threshold is not None and duration >= self.slow_threshold:
+            self.on_slow(event_type, listener, duration)
+
+    def wrap(self, event_type: Type, listener: Callable, is_async: bool = False) -> Callable:
+        original = listener.listener if isinstance(listener, _Submitted) else listener
+        with self._lock:
+            stats = self._stats.get((event_type, original))
+            if stats is None:
+                stats = self._stats[(event_type, original)] = ListenerStats()
+        record = self._record
+
+        if isinstance(listener, _Submitted):
+            return _ProfiledSubmitted(listener, lambda duration, error: record(
+                stats, event_type, original, duration, error))
+
+        if is_async:
+            @wraps(listener)
+            async def profiled(event):
+                start = perf_counter()
+                error = False
+                try:
+                    return await listener(event)
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    record(stats, event_type, original, perf_counter() - start, error)
+        else:
+            @wraps(listener)
+            def profiled(event):
+                start = perf_counter()
+                error = False
+                try:
+                    return listener(event)
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    record(stats, event_type, original, perf_counter() - start, error)
+        return profiled
+
+
+class _ProfiledSubmitted(_Submitted):
+    __slots__ = ('record',)
+
+    def __init__(self, submitted: _Submitted, record: Callable[[float, bool], None]):
+        super().__init__(submitted.dispatcher, submitted.listener, submitted.policy)
+        self.record = record
+
+    def __call__(self, event, collect: bool = True) -> Future:
+        start = perf_counter()
+        future = super().__call__(event, collect)
+        future.add_done_callback(
+            lambda f: self.record(perf_counter() - start, f.cancelled() or f.exception() is not None))
+        return future
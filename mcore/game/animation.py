@@ -21,14 +21,30 @@ class GameView(arcade.View):
     def on_draw(self):
         arcade.start_render()
         self.animations.draw()
+
+Animations spawned often share an `AnimationTemplate`, which loads the frames once:
+
+EXPLOSION = AnimationTemplate.from_sprite_sheet('./resources/effects/explosion.png', 64, 64, count=16, duration=50)
+self.animations.append(EXPLOSION.spawn(center_x=event.pos.x, center_y=event.pos.y))
 """
 
 import dataclasses
 from pathlib import Path
-from typing import Union, List
+from typing import Union, Dict, Tuple, Sequence, Optional, Iterable
 
 from arcade import load_texture, Sprite, Texture
 
+# (file, x, y, width, height) -> texture
+_TEXTURES: Dict[Tuple[str, int, int, int, int], Texture] = {}
+
+
+def _texture(file: Union[str, Path], x: int = 0, y: int = 0, width: int = 0, height: int = 0) -> Texture:
+    key = (str(file), x, y, width, height)
+    texture = _TEXTURES.get(key)
+    if texture is None:
+        texture = _TEXTURES[key] = load_texture(file, x, y, width, height, hit_box_algorithm='None')
+    return texture
+
 
 @dataclasses.dataclass
 class AnimationFrame:
@@ -40,11 +56,64 @@ class AnimationFrame:
     scale: float
 
 
+class AnimationTemplate:
+    """
+    Immutable frames of an animation, shared by all animations spawned from it.
+    Textures are loaded once per file (and sprite sheet region).
+    """
+
+    def __init__(self, frames: Iterable[AnimationFrame]):
+        self.frames: Tuple[AnimationFrame, ...] = tuple(frames)
+        self.duration_ms = sum(frame.duration for frame in self.frames)
+
+    @classmethod
+    def from_files(cls, frames: Iterable[Tuple[int, Union[str, Path], float]]) -> 'AnimationTemplate':
+        """
+        :param frames: (duration in ms, file, scale) per frame
+        """
+        return cls(AnimationFrame(duration, _texture(file), scale) for duration, file, scale in frames)
+
+    @classmethod
+    def from_sprite_sheet(cls,
+                          file: Union[str, Path],
+                          frame_width: int,
+                          frame_height: int,
+                          count: int,
+                          duration: Union[int, Sequence[int]],
+                          columns: Optional[int] = None,
+                          margin: int = 0,
+                          scale: float = 1.0,
+                          ) -> 'AnimationTemplate':
+        """
+        Slices `count` frames row by row from a sprite sheet.
+
+        :param duration: duration in ms of all frames or per frame
+        :param columns: frames per row, defaults to a single row
+        :param margin: space between frames in pixel
+        """
+        columns = columns or count
+        durations = [duration] * count if isinstance(duration, int) else list(duration)
+        frames = []
+        for i in range(count):
+            row, column = divmod(i, columns)
+            texture = _texture(file,
+                               x=column * (frame_width + margin),
+                               y=row * (frame_height + margin),
+                               width=frame_width,
+                               height=frame_height)
+            frames.append(AnimationFrame(durations[i], texture, scale))
+        return cls(frames)
+
+    def spawn(self, scale: float = 1, center_x: float = 0, center_y: float = 0) -> 'Animation':
+        return Animation(scale=scale, center_x=center_x, center_y=center_y, template=self)
+
+
 class Animation(Sprite):
     def __init__(self,
                  scale: float = 1,
                  center_x: float = 0,
                  center_y: float = 0,
+                 template: Optional[AnimationTemplate] = None,
                  ):
         super().__init__(
             scale=scale,
@@ -53,19 +122,28 @@ class Animation(Sprite):
         )
 
         self.cur_frame_idx = 0
-        self.frames: List[AnimationFrame] = []
         self.time_counter = 0.0
-
-        self.duration_ms = 0
         self.total_time_ms = 0
 
+        if template is None:
+            self.frames: Sequence[AnimationFrame] = []
+            self.duration_ms = 0
+        else:
+            # shared with the template, copied on add_frame
+            self.frames = template.frames
+            self.duration_ms = template.duration_ms
+            if self.frames:
+                self.texture = self.frames[0].texture
+
     def add_frame(self, duration: int, file: Union[str, Path], scale=1.0):
         """
         :param file: Union[str, Path] Frame image to add
         :type duration: int Duration in ms
         """
-        frame_texture = load_texture(file, hit_box_algorithm='None')
+        frame_texture = _texture(file)
 
+        if isinstance(self.frames, tuple):
+            self.frames = list(self.frames)
         if len(self.frames) == 0:
             self.texture = frame_texture
 
@@ -1,23 +1,267 @@
 """
 Configures a logger to log <=INFO to stdout and >INFO to stderr
 """
+import atexit
 import logging
 import os
+import queue
 import sys
+import time
+from logging.handlers import QueueHandler
+from threading import Thread, Lock
+from typing import List, Optional, Dict, Tuple
+
+from mcore.serialize import EnhancedJSONEncoder
 
 DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
 NO_TIME_FORMAT = '%(levelname)s - %(name)s - %(message)s'
+# log_format for JSONFormatter
+JSON_FORMAT = 'json'
+
+# overflow policies of BackgroundHandler
+BLOCK = 'block'
+DROP = 'drop'
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Passes records through a bounded queue to a thread, which writes them in batches to the stream handlers.
+    A full queue blocks the logging thread (BLOCK) or drops the record (DROP), drops are reported once per second.
+    Pending records are written on `close` and at exit.
+    """
+
+    def __init__(self, handlers: List[logging.StreamHandler], queue_size: int = 10000, overflow: str = DROP,
+                 batch_size: int = 512):
+        if overflow not in (BLOCK, DROP):
+            raise ValueError(f'Unknown overflow policy {overflow}')
+        super().__init__(queue.Queue(queue_size))
+        self.handlers = handlers
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._next_report = 0.0
+        self._stopped = False
+        self._stop_lock = Lock()
+        self._thread = Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        # records stay in process, only the arguments are merged, as they could change until the record is written
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self._stopped:
+            self._write([record])
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == BLOCK:
+                self.queue.put(record)
+            else:
+                self.dropped += 1
+
+    def _run(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(record is None for record in batch)
+            if stop:
+                batch = [record for record in batch if record is not None]
+            if self.dropped and (stop or time.monotonic() >= self._next_report):
+                self._next_report = time.monotonic() + 1
+                dropped, self.dropped = self.dropped, 0
+                batch.append(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f'{dropped} log records dropped, queue full',
+                }))
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        for handler in self.handlers:
+            lines = [handler.format(record) for record in batch
+                     if record.levelno >= handler.level and handler.filter(record)]
+            if not lines:
+                continue
+            lines.append('')
+            handler.acquire()
+            try:
+                handler.stream.write(handler.terminator.join(lines))
+                handler.flush()
+            except Exception:
+                handler.handleError(batch[0])
+            finally:
+                handler.release()
+
+    def stop(self):
+        """
+        Writes pending records and stops the writer thread.
+        """
+        with self._stop_lock:
+            if not self._stopped:
+                # later records are written directly
+                self._stopped = True
+                self.queue.put(None)
+                self._thread.join()
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+# attributes of every record, others are extras
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class _LogJSONEncoder(EnhancedJSONEncoder):
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return repr(o)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as json objects with time, level, logger, message, the static `fields`,
+    extra attributes of the record (`extra=...`, encoded with `EnhancedJSONEncoder`), exc_info and stack_info.
+    The static part is encoded once per logger and level.
+    """
+
+    def __init__(self, fields: Optional[dict] = None):
+        super().__init__()
+        self.fields = fields or {}
+        self._encode = _LogJSONEncoder().encode
+        self._prefixes: Dict[Tuple[str, int], str] = {}
+        self._second: Tuple[int, str] = (-1, '')
+
+    def _prefix(self, record) -> str:
+        prefix = self._prefixes.get((record.name, record.levelno))
+        if prefix is None:
+            static = {'level': record.levelname, 'logger': record.name, **self.fields}
+            prefix = self._prefixes[(record.name, record.levelno)] = self._encode(static)[:-1]
+        return prefix
+
+    def _time(self, record) -> str:
+        second = int(record.created)
+        cached_second, text = self._second
+        if second != cached_second:
+            text = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(second))
+            self._second = (second, text)
+        return f'"{text}.{int(record.msecs):03d}"'
+
+    def format(self, record) -> str:
+        encode = self._encode
+        parts = [self._prefix(record), ', "time": ', self._time(record), ', "message": ', encode(record.getMessage())]
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key[0] != '_':
+                parts += (', ', encode(key), ': ', encode(value))
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            parts += (', "exc_info": ', encode(record.exc_text))
+        if record.stack_info:
+            parts += (', "stack_info": ', encode(self.formatStack(record.stack_info)))
+        parts.append('}')
+        return ''.join(parts)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Passes at most `rate` records per `per` seconds for each call site (file and line, so one message template).
+    The number of suppressed records is added to the next passing record of the call site
+    as message suffix and `suppressed` attribute.
+    Can be added to multiple handlers, each record is only counted once.
+    """
+
+    def __init__(self, rate: int = 10, per: float = 1.0):
+        super().__init__()
+        self.rate = rate
+        self.per = per
+        # call site -> [window start, passed, suppressed]
+        self._windows: Dict[Tuple[str, int], list] = {}
+
+    def filter(self, record) -> bool:
+        passed = record.__dict__.get('_rate_limited')
+        if passed is not None:
+            return passed
+
+        key = (record.pathname, record.lineno)
+        window = self._windows.get(key)
+        if window is None or record.created - window[0] >= self.per:
+            self._windows[key] = [record.created, 1, 0]
+            if window is not None and window[2]:
+                record.msg = f'{record.getMessage()} ({window[2]} similar records suppressed)'
+                record.args = None
+                record.suppressed = window[2]
+            passed = True
+        elif window[1] < self.rate:
+            window[1] += 1
+            passed = True
+        else:
+            window[2] += 1
+            passed = False
+        record._rate_limited = passed
+        return passed
+
+
+class SampleFilter(logging.Filter):
+    """
+    Passes the first and then every `every`-th record of each call site, passing records get a `sampled` attribute.
+    Can be added to multiple handlers, each record is only counted once.
+    """
+
+    def __init__(self, every: int = 100):
+        super().__init__()
+        self.every = every
+        self._counts: Dict[Tuple[str, int], int] = {}
+
+    def filter(self, record) -> bool:
+        passed = record.__dict__.get('_sampled')
+        if passed is not None:
+            return passed
+
+        key = (record.pathname, record.lineno)
+        n = self._counts.get(key, 0)
+        self._counts[key] = n + 1
+        passed = n % self.every == 0
+        if passed:
+            record.sampled = self.every
+        record._sampled = passed
+        return passed
 
 
 def configure(logger: logging.Logger = logging.root,
               log_level="INFO",
-              log_format=DEFAULT_FORMAT
+              log_format=DEFAULT_FORMAT,
+              background=False,
+              queue_size=10000,
+              overflow=DROP,
+              rate_limit: Optional[int] = None,
               ):
+    """
+    With `background` records are formatted and written by a thread, see `BackgroundHandler`.
+    `log_format=JSON_FORMAT` writes json lines, see `JSONFormatter`.
+    `rate_limit` limits records per second and call site, see `RateLimitFilter`.
+    """
     class InfoFilter(logging.Filter):
         def filter(self, rec):
             return rec.levelno in (logging.DEBUG, logging.INFO)
 
-    formatter = logging.Formatter(log_format)
+    formatter = JSONFormatter() if log_format == JSON_FORMAT else logging.Formatter(log_format)
     log_level_name = os.environ.get("LOG_LEVEL", log_level)
     logger.setLevel(logging.getLevelName(log_level_name))
 
@@ -30,7 +274,15 @@ def configure(logger: logging.Logger = logging.root,
     std_err_handler.setLevel(logging.WARNING)
     std_err_handler.setFormatter(formatter)
 
-    logger.addHandler(std_out_handler)
-    logger.addHandler(std_err_handler)
+    handlers = [std_out_handler, std_err_handler]
+    if background:
+        handlers = [BackgroundHandler(handlers, queue_size, overflow)]
+    if rate_limit:
+        # added to the handlers, filters of a logger do not apply to records of its child loggers
+        rate_limit_filter = RateLimitFilter(rate_limit)
+        for handler in handlers:
+            handler.addFilter(rate_limit_filter)
+    for handler in handlers:
+        logger.addHandler(handler)
 
     return logger
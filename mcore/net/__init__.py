@@ -0,0 +1,1036 @@
+import asyncio
+import base64
+import dataclasses
+import json
+import logging
+import os
+import socket
+import struct
+import zlib
+from asyncio import StreamReader, StreamWriter
+from contextlib import contextmanager, asynccontextmanager
+from datetime import datetime
+from json import JSONDecodeError
+from threading import Lock
+from typing import Any, Optional, Literal, Tuple, Iterable, Sequence, Dict, Union, List, Type, TYPE_CHECKING
+
+from mcore.serialize import EnhancedJSONEncoder
+
+if TYPE_CHECKING:
+    from mcore.net.metrics import NetworkMetrics
+
+logger = logging.getLogger(__name__)
+
+# header size to use a LEB128 varint as length prefix
+VARINT = 0
+_VARINT_MAX = 10
+
+
+def encode_header(length: int, size: int, order: Literal["little", "big"] = 'big') -> bytes:
+    """
+    Encodes the length prefix of a frame, `size` is the header size in bytes or `VARINT`.
+    """
+    if size != VARINT:
+        return length.to_bytes(size, order, signed=False)
+
+    out = bytearray()
+    while length > 0x7F:
+        out.append((length & 0x7F) | 0x80)
+        length >>= 7
+    out.append(length)
+    return bytes(out)
+
+
+def decode_header(data, size: int, order: Literal["little", "big"] = 'big') -> Tuple[int, int]:
+    """
+    Decodes the length prefix at the start of `data`.
+    Returns (length, header bytes), or (-1, 0) if `data` does not contain a complete header yet.
+    """
+    if size != VARINT:
+        if len(data) < size:
+            return -1, 0
+        return int.from_bytes(data[:size], order, signed=False), size
+
+    length = 0
+    for i, byte in enumerate(data[:_VARINT_MAX]):
+        length |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return length, i + 1
+    if len(data) >= _VARINT_MAX:
+        raise ValueError('Invalid varint header')
+    return -1, 0
+
+
+class FrameReader:
+    """
+    Reassembles length prefixed frames from a socket into a reusable buffer.
+    The buffer grows to fit frames larger than its initial size.
+
+    With `flagged` the lowest bit of the header value is a flag of the frame, which is stored in `flag`.
+
+    reader = FrameReader()
+    frame = reader.read(sock)  # memoryview, valid until the next read
+    """
+
+    def __init__(self, header: int = 2, order: Literal["little", "big"] = 'big', size: int = 64 * 1024,
+                 flagged: bool = False):
+        self.header = header
+        self.order = order
+        self.flagged = flagged
+        self.flag = False
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+    def read(self, sock: socket.socket) -> Optional[memoryview]:
+        """
+        Returns the next frame, or None if the connection was closed.
+        """
+        frame = self.next_frame()
+        while frame is None:
+            received = sock.recv_into(self._view[self._end:])
+            if not received:
+                return None
+            self._end += received
+            frame = self.next_frame()
+        return frame
+
+    def next_frame(self) -> Optional[memoryview]:
+        """
+        Returns the next frame from already received data, or None if more data is required.
+        """
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        length, offset = decode_header(self._view[self._start:self._end], self.header, self.order)
+        if length < 0:
+            self._reserve(self.header or _VARINT_MAX)
+            return None
+        if self.flagged:
+            self.flag = bool(length & 1)
+            length >>= 1
+
+        begin = self._start + offset
+        end = begin + length
+        if end > self._end:
+            self._reserve(offset + length)
+            return None
+
+        self._start = end
+        return self._view[begin:end]
+
+    def _reserve(self, size: int):
+        # make room for `size` bytes starting at the pending frame
+        if self._start + size <= len(self._buffer):
+            return
+
+        pending = self._end - self._start
+        if size > len(self._buffer):
+            buffer = bytearray(max(size, 2 * len(self._buffer)))
+            buffer[:pending] = self._view[self._start:self._end]
+            self._view.release()
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+        else:
+            self._view[:pending] = self._view[self._start:self._end]
+
+        self._start = 0
+        self._end = pending
+
+
+class PacketJSONEncoder(EnhancedJSONEncoder):
+    def default(self, o):
+        if type(o) is Packet:
+            return super().default(o.__dict__)
+        if isinstance(o, PacketSchema):
+            return o.to_dict()
+        return super().default(o)
+
+
+# TODO support package in Network
+class Packet(dict):
+    def __init__(self, type: str, **kwargs):
+        super().__init__(**kwargs)
+        self.type = type
+
+    def __getattr__(self, attr):
+        return self.get(attr)
+
+    def __setattr__(self, key, value):
+        if type(value) is dict:
+            value = Packet(**value)
+        self[key] = value
+
+
+def _as_packet(data) -> Union[Packet, 'PacketSchema']:
+    """
+    :raises ValueError: if the decoded data is no packet
+    """
+    if type(data) is dict:
+        if 'type' not in data:
+            raise ValueError('Packet without type')
+        _type = data.pop('type')
+        try:
+            return Packet(_type, **data)
+        except TypeError as e:
+            raise ValueError('Packet with non string keys') from e
+    if isinstance(data, (Packet, PacketSchema)):
+        return data
+    raise ValueError(f'Expected a packet, got {type(data).__name__}')
+
+
+class Codec:
+    """
+    Converts packets into frame payloads and back, both ends of a connection have to use the same codec.
+    """
+    name: str
+
+    def encode(self, data: Any) -> bytes:
+        raise NotImplementedError()
+
+    def decode(self, data) -> Any:
+        """
+        :raises ValueError: if data could not be decoded
+        """
+        raise NotImplementedError()
+
+
+class JSONCodec(Codec):
+    name = 'json'
+
+    def encode(self, data: Any) -> bytes:
+        return json.dumps(data, cls=PacketJSONEncoder).encode()
+
+    def decode(self, data) -> Any:
+        try:
+            return json.loads(str(data, 'utf-8'))
+        except RecursionError as e:
+            raise ValueError('Too deeply nested json') from e
+
+
+_NONE, _TRUE, _FALSE, _INT, _FLOAT, _STR, _BYTES, _LIST, _DICT, _DATETIME, _PACKET, _SCHEMA = range(12)
+_DOUBLE = struct.Struct('>d')
+
+
+def _write_uvarint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_uvarint(data, pos: int) -> Tuple[int, int]:
+    value = data[pos]
+    if value < 0x80:
+        return value, pos + 1
+
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _write_str(out: bytearray, value: str):
+    raw = value.encode()
+    _write_uvarint(out, len(raw))
+    out += raw
+
+
+def _encode_value(o, out: bytearray):
+    t = type(o)
+    if t is str:
+        out.append(_STR)
+        _write_str(out, o)
+    elif t is int:
+        out.append(_INT)
+        _write_uvarint(out, o << 1 if o >= 0 else ((-o) << 1) - 1)
+    elif t is float:
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(o)
+    elif o is None:
+        out.append(_NONE)
+    elif o is True:
+        out.append(_TRUE)
+    elif o is False:
+        out.append(_FALSE)
+    elif isinstance(o, PacketSchema):
+        out.append(_SCHEMA)
+        _write_uvarint(out, t.type_id)
+        t._encode_fields(o, out)
+    elif t is Packet:
+        out.append(_PACKET)
+        _write_str(out, o['type'])
+        _write_uvarint(out, len(o) - 1)
+        for key, value in o.items():
+            if key != 'type':
+                _encode_value(key, out)
+                _encode_value(value, out)
+    elif isinstance(o, dict):
+        out.append(_DICT)
+        _write_uvarint(out, len(o))
+        for key, value in o.items():
+            _encode_value(key, out)
+            _encode_value(value, out)
+    elif isinstance(o, (list, tuple)):
+        out.append(_LIST)
+        _write_uvarint(out, len(o))
+        for value in o:
+            _encode_value(value, out)
+    elif isinstance(o, (bytes, bytearray, memoryview)):
+        out.append(_BYTES)
+        _write_uvarint(out, len(o))
+        out += o
+    elif isinstance(o, datetime):
+        out.append(_DATETIME)
+        _write_str(out, o.isoformat())
+    elif dataclasses.is_dataclass(o):
+        fields = dataclasses.fields(o)
+        out.append(_DICT)
+        _write_uvarint(out, len(fields))
+        for field in fields:
+            _encode_value(field.name, out)
+            _encode_value(getattr(o, field.name), out)
+    elif isinstance(o, int):
+        _encode_value(int(o), out)
+    elif isinstance(o, float):
+        _encode_value(float(o), out)
+    elif isinstance(o, str):
+        _encode_value(str(o), out)
+    else:
+        raise TypeError(f'Object of type {t.__name__} is not serializable')
+
+
+def _decode_value(data, pos: int) -> Tuple[Any, int]:
+    tag = data[pos]
+    pos += 1
+    if tag == _STR:
+        length, pos = _read_uvarint(data, pos)
+        end = pos + length
+        return data[pos:end].decode(), end
+    elif tag == _INT:
+        value, pos = _read_uvarint(data, pos)
+        return (value >> 1 if not value & 1 else -((value + 1) >> 1)), pos
+    elif tag == _FLOAT:
+        return _DOUBLE.unpack_from(data, pos)[0], pos + 8
+    elif tag == _NONE:
+        return None, pos
+    elif tag == _TRUE:
+        return True, pos
+    elif tag == _FALSE:
+        return False, pos
+    elif tag == _SCHEMA:
+        type_id, pos = _read_uvarint(data, pos)
+        schema = SCHEMAS.get(type_id)
+        if schema is None:
+            raise ValueError(f'Unknown packet schema {type_id}')
+        return schema._decode_fields(data, pos)
+    elif tag == _DICT or tag == _PACKET:
+        if tag == _PACKET:
+            length, pos = _read_uvarint(data, pos)
+            end = pos + length
+            result = Packet(data[pos:end].decode())
+            pos = end
+        else:
+            result = {}
+        count, pos = _read_uvarint(data, pos)
+        for _ in range(count):
+            key, pos = _decode_value(data, pos)
+            value, pos = _decode_value(data, pos)
+            result[key] = value
+        return result, pos
+    elif tag == _LIST:
+        count, pos = _read_uvarint(data, pos)
+        result = []
+        for _ in range(count):
+            value, pos = _decode_value(data, pos)
+            result.append(value)
+        return result, pos
+    elif tag == _BYTES:
+        length, pos = _read_uvarint(data, pos)
+        end = pos + length
+        return bytes(data[pos:end]), end
+    elif tag == _DATETIME:
+        length, pos = _read_uvarint(data, pos)
+        end = pos + length
+        return datetime.fromisoformat(data[pos:end].decode()), end
+    raise ValueError(f'Unknown type tag {tag}')
+
+
+SCHEMAS: Dict[int, Type['PacketSchema']] = {}
+
+
+def _compile_schema(cls, fields: List[Tuple[str, Any]]):
+    # generates __init__, encode and decode functions, which handle field values in declaration order
+    formats = {}
+    names = [name for name, _ in fields]
+    params = [name if name not in cls._defaults else f'{name}=_defaults[{name!r}]' for name in names]
+    init = [f'def __init__(self, {", ".join(params)}):']
+    init.extend(f'    self.{name} = {name}' for name in names)
+    encode = ['def encode(o, out):']
+    decode = ['def decode(data, pos):']
+    i = 0
+    while i < len(fields):
+        name, kind = fields[i]
+        if kind in (float, 'float'):
+            run = [name]
+            while i + len(run) < len(fields) and fields[i + len(run)][1] in (float, 'float'):
+                run.append(fields[i + len(run)][0])
+            fmt = f'_fmt_{i}'
+            formats[fmt] = struct.Struct('>' + 'd' * len(run))
+            values = ', '.join(f'o.{n}' for n in run)
+            encode.append(f'    out += {fmt}.pack({values})')
+            decode.append(f'    {", ".join(run)}, = {fmt}.unpack_from(data, pos)')
+            decode.append(f'    pos += {8 * len(run)}')
+            i += len(run)
+            continue
+
+        if kind in (int, 'int'):
+            encode.append(f'    v = o.{name}')
+            encode.append('    _write_uvarint(out, v << 1 if v >= 0 else ((-v) << 1) - 1)')
+            decode.append('    v, pos = _read_uvarint(data, pos)')
+            decode.append(f'    {name} = v >> 1 if not v & 1 else -((v + 1) >> 1)')
+        elif kind in (str, 'str'):
+            encode.append(f'    _write_str(out, o.{name})')
+            decode.append('    v, pos = _read_uvarint(data, pos)')
+            decode.append(f'    {name} = data[pos:pos + v].decode()')
+            decode.append('    pos += v')
+        elif kind in (bool, 'bool'):
+            encode.append(f'    out.append(_TRUE if o.{name} else _FALSE)')
+            decode.append(f'    {name} = data[pos] == _TRUE')
+            decode.append('    pos += 1')
+        else:
+            encode.append(f'    _encode_value(o.{name}, out)')
+            decode.append(f'    {name}, pos = _decode_value(data, pos)')
+        i += 1
+
+    init.append('    pass')
+    encode.append('    pass')
+    decode.append(f'    return cls({", ".join(names)}), pos')
+
+    namespace = dict(globals(), cls=cls, _defaults=cls._defaults, **formats)
+    for source in (init, encode, decode):
+        exec('\n'.join(source), namespace)
+    return namespace['__init__'], namespace['encode'], namespace['decode']
+
+
+class _PacketSchemaMeta(type):
+    def __new__(mcs, name, bases, namespace, type_id: Optional[int] = None):
+        annotations = namespace.get('__annotations__', {}) if bases else {}
+        own_fields = [(n, k) for n, k in annotations.items() if not n.startswith('_')]
+        defaults = {n: namespace.pop(n) for n, _ in own_fields if n in namespace}
+        namespace['__slots__'] = tuple(n for n, _ in own_fields)
+
+        cls = super().__new__(mcs, name, bases, namespace)
+        cls._fields = tuple(getattr(cls, '_fields', ())) + tuple(own_fields)
+        cls._defaults = dict(getattr(cls, '_defaults', {}), **defaults)
+        if 'type' in (n for n, _ in cls._fields):
+            raise TypeError('Packet schemas can not declare a field named type')
+
+        if type_id is not None:
+            if type_id in SCHEMAS:
+                raise ValueError(f'Packet schema {type_id} already registered by {SCHEMAS[type_id].__name__}')
+            cls.type_id = type_id
+            cls.type = namespace.get('type', name)
+            cls.__init__, cls._encode_fields, cls._decode_fields = _compile_schema(cls, list(cls._fields))
+            SCHEMAS[type_id] = cls
+        return cls
+
+
+class PacketSchema(metaclass=_PacketSchemaMeta):
+    """
+    Packet with declared fields, encoded by `BINARY` without field names.
+    Instances use __slots__ and are returned by `recv_pkg` instead of `Packet`.
+    Other codecs send them as `Packet` with the class name as type.
+
+    class Position(PacketSchema, type_id=1):
+        id: int
+        x: float
+        y: float
+
+    network.send_pkg(Position(1, 2.5, 3.0))
+    """
+    __slots__ = ()
+    type_id: int
+    type: str
+
+    def to_dict(self) -> dict:
+        data = {name: getattr(self, name) for name, _ in self._fields}
+        data['type'] = self.type
+        return data
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name, _ in self._fields)
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={getattr(self, name)!r}' for name, _ in self._fields)
+        return f'{type(self).__name__}({values})'
+
+
+class BinaryCodec(Codec):
+    """
+    Compact tagged binary format, supports None, bool, int, float, str, bytes, list, tuple, dict,
+    datetime, dataclasses (decoded as dict) and Packet.
+    """
+    name = 'binary'
+
+    def encode(self, data: Any) -> bytes:
+        out = bytearray()
+        _encode_value(data, out)
+        return out
+
+    def decode(self, data) -> Any:
+        data = bytes(data)
+        try:
+            value, pos = _decode_value(data, 0)
+        except (IndexError, struct.error) as e:
+            raise ValueError('Truncated binary data') from e
+        except (TypeError, RecursionError) as e:
+            # e.g. unhashable dict keys or deeply nested containers
+            raise ValueError('Invalid binary data') from e
+        if pos != len(data):
+            raise ValueError('Invalid binary data')
+        return value
+
+
+CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec):
+    CODECS[codec.name] = codec
+
+
+def select_codec(own: Sequence[str], offered: Sequence[str]) -> Codec:
+    """
+    Picks the codec both sides prefer most, independent of which side calls.
+    """
+    common = [name for name in own if name in offered and name in CODECS]
+    if not common:
+        raise ValueError(f'No common codec in {own} and {offered}')
+    return CODECS[min(common, key=lambda name: (own.index(name) + offered.index(name), name))]
+
+
+JSON = JSONCodec()
+BINARY = BinaryCodec()
+register_codec(JSON)
+register_codec(BINARY)
+
+
+class Compression:
+    """
+    Compresses frame payloads of at least `threshold` bytes, before encryption.
+    Compressed frames are marked by the lowest bit of the length header, so both ends have to enable compression.
+    The flag halves the maximum frame size of fixed size headers, 32767 bytes with the default 2 byte header,
+    use `header=4` or `VARINT` for larger packets.
+    Instances keep per connection state and must not be shared between connections.
+    """
+    name: str
+
+    def __init__(self, threshold: int = 256):
+        self.threshold = threshold
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+    def decompress(self, data) -> bytes:
+        raise NotImplementedError()
+
+
+class ZlibCompression(Compression):
+    """
+    Raw deflate with an optional preset `dictionary` of common content (like packet keys).
+    With `stream` the compression context is kept over all frames of a connection,
+    so repeated content compresses well even without a dictionary.
+    """
+    name = 'zlib'
+
+    def __init__(self, threshold: int = 256, level: int = 6, dictionary: bytes = b'', stream: bool = False):
+        super().__init__(threshold)
+        self.level = level
+        self.dictionary = dictionary
+        self.stream = stream
+        self._compressor = self._compressobj() if stream else None
+        self._decompressor = self._decompressobj() if stream else None
+
+    def _compressobj(self):
+        if self.dictionary:
+            return zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=self.dictionary)
+        return zlib.compressobj(self.level, zlib.DEFLATED, -15)
+
+    def _decompressobj(self):
+        if self.dictionary:
+            return zlib.decompressobj(-15, zdict=self.dictionary)
+        return zlib.decompressobj(-15)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.stream:
+            return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        compressor = self._compressobj()
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data) -> bytes:
+        if self.stream:
+            return self._decompressor.decompress(data)
+        return self._decompressobj().decompress(data)
+
+
+class ZstdCompression(Compression):
+    """
+    Zstandard compression, faster than zlib, requires `zstandard` to be installed.
+    """
+    name = 'zstd'
+
+    def __init__(self, threshold: int = 256, level: int = 3, dictionary: bytes = b''):
+        super().__init__(threshold)
+
+        import zstandard
+        zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        self._compressor = zstandard.ZstdCompressor(level=level, dict_data=zdict)
+        self._decompressor = zstandard.ZstdDecompressor(dict_data=zdict)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+def default_compression(threshold: int = 256) -> Compression:
+    """
+    Zstandard if installed, zlib otherwise. Both ends have to end up with the same compression.
+    """
+    try:
+        return ZstdCompression(threshold)
+    except ImportError:
+        return ZlibCompression(threshold)
+
+
+def _compress(compression: Optional[Compression], data) -> Tuple[int, int]:
+    # returns the shift of the length in the header and the compression flag
+    if compression is None:
+        return 0, 0
+    return 1, int(len(data) >= compression.threshold)
+
+
+def _frame_header(length: int, length_shift: int, flag: int, size: int, order: Literal["little", "big"]) -> bytes:
+    if size != VARINT and length >> (8 * size - length_shift):
+        limit = (1 << (8 * size - length_shift)) - 1
+        compressed = ' with compression' if length_shift else ''
+        raise ValueError(f'Frame of {length} bytes exceeds the limit of {limit} bytes of a {size} byte header'
+                         f'{compressed}, use header=4 or VARINT')
+    return encode_header(length << length_shift | flag, size, order)
+
+
+class Network:
+    """
+    Length prefixed frames over a socket.
+    `BUFFER` is the header size in bytes (2, 4, 8) or `VARINT`, both ends have to use the same value.
+    Packets are serialized with `codec`, which can be agreed on with `negotiate_codec`.
+    Frames are compressed with `compression`, if given.
+    """
+    BUFFER = 2
+    ORDER: Literal["little", "big"] = 'big'
+
+    def __init__(self, socket: socket.socket, header: Optional[int] = None, codec: Codec = JSON,
+                 compression: Optional[Compression] = None):
+        self.socket = socket
+        if header is not None:
+            self.BUFFER = header
+        self.codec = codec
+        self.compression = compression
+        self.metrics: Optional['NetworkMetrics'] = None
+        self._lock = Lock()
+        self._send_lock = Lock()
+        self._reader = FrameReader(self.BUFFER, self.ORDER, flagged=compression is not None)
+        self._cork: Optional[bytearray] = None
+
+    def _recv_frame(self) -> Optional[memoryview]:
+        # returned view is only valid until the next read
+        return self._reader.read(self.socket)
+
+    def _unwrap(self, frame) -> Any:
+        # frame payload to serialized data
+        return frame
+
+    def _wrap(self, data: bytes) -> bytes:
+        # serialized data to frame payload
+        return data
+
+    def _recv_decoded(self, decode) -> Any:
+        with self._lock:
+            frame = self._recv_frame()
+            if not frame:
+                return None
+            data = self._unwrap(frame)
+            if self._reader.flag:
+                data = self.compression.decompress(data)
+            return decode(data)
+
+    def _recv(self) -> str:
+        return self._recv_decoded(lambda data: str(data, 'utf-8')) or ''
+
+    def _frame(self, data: bytes, out: bytearray):
+        length_shift, flag = _compress(self.compression, data)
+        if flag:
+            data = self.compression.compress(data)
+        payload = self._wrap(data)
+        out += _frame_header(len(payload), length_shift, flag, self.BUFFER, self.ORDER)
+        out += payload
+
+    def _send_data(self, data: bytes):
+        with self._send_lock:
+            if self._cork is not None:
+                self._frame(data, self._cork)
+                return
+
+            buffer = bytearray()
+            self._frame(data, buffer)
+            self.socket.sendall(buffer)
+
+    def _send(self, msg: str):
+        self._send_data(msg.encode())
+
+    @contextmanager
+    def batch(self):
+        """
+        Collects all packets sent within the context and flushes them with a single call.
+
+        with network.batch():
+            network.send_pkg(a)
+            network.send_pkg(b)
+        """
+        with self._send_lock:
+            if self._cork is not None:
+                raise RuntimeError('Network is already batching')
+            self._cork = bytearray()
+        try:
+            yield self
+        finally:
+            with self._send_lock:
+                buffer, self._cork = self._cork, None
+                if buffer:
+                    self.socket.sendall(buffer)
+
+    def send_many(self, packets: Iterable[Packet]):
+        """
+        Sends multiple packets as one buffer.
+        """
+        with self.batch():
+            for packet in packets:
+                self.send_pkg(packet)
+
+    def negotiate_codec(self, codecs: Sequence[str] = ('binary', 'json')) -> Codec:
+        """
+        Exchanges supported codecs with the other side, which has to call `negotiate_codec` as well.
+        """
+        self.send_json({'codecs': list(codecs)})
+        offer = self.recv_json()
+        if offer is None:
+            raise ConnectionError('Connection closed during codec negotiation')
+        self.codec = select_codec(codecs, offer['codecs'])
+        if self.metrics is not None:
+            self.codec = self.metrics.timed_codec(self.codec)
+        return self.codec
+
+    def recv_json(self) -> Optional[dict]:
+        data = self._recv()
+        if not data:
+            return None
+
+        try:
+            return json.loads(data)
+        except JSONDecodeError:
+            logger.exception(f'Could not parse data: {data}')
+            return None
+
+    def send_json(self, data: Any):
+        self._send(json.dumps(data, cls=EnhancedJSONEncoder))
+
+    def recv_pkg(self) -> Optional[Union[Packet, PacketSchema]]:
+        try:
+            return self._recv_decoded(self._decode_pkg)
+        except ValueError:
+            logger.exception(f'Could not decode packet with {self.codec.name} codec')
+            return None
+
+    def _decode_pkg(self, data) -> Union[Packet, PacketSchema]:
+        return _as_packet(self.codec.decode(data))
+
+    def send_pkg(self, data: Union[Packet, PacketSchema]):
+        self._send_data(self.codec.encode(data))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.socket.close()
+
+
+class SecureNetwork(Network):
+    def __init__(self, socket_: socket.socket, key: str, header: Optional[int] = None, codec: Codec = JSON,
+                 compression: Optional[Compression] = None):
+        super().__init__(socket_, header, codec, compression)
+
+        from cryptography.fernet import Fernet
+        self.cipher_suite = Fernet(key.encode())
+
+    # --- security layer
+    def _unwrap(self, frame) -> bytes:
+        return self.cipher_suite.decrypt(bytes(frame))
+
+    def _wrap(self, data: bytes) -> bytes:
+        return self.cipher_suite.encrypt(bytes(data))
+
+    # --- crypto
+    @staticmethod
+    def generate_key():
+        from cryptography.fernet import Fernet
+        return Fernet.generate_key().decode()
+
+    def encrypt(self, text: str):
+        return self.cipher_suite.encrypt(text.encode()).decode()
+
+    def decrypt(self, cipher_text: str):
+        return self.cipher_suite.decrypt(cipher_text.encode()).decode()
+
+
+class AEADNetwork(Network):
+    """
+    Like `SecureNetwork`, but encrypts the binary frame payload with ChaCha20-Poly1305 or AES-GCM,
+    without base64 and timestamps. Adds 16 bytes per frame.
+
+    `key` is a pre-shared key, which can be used for many connections: both sides send a random salt
+    when the connection is created, the frames are encrypted with session keys derived (HKDF-SHA256)
+    from the key and both salts, one per direction. Nonces are counters within the session.
+    Exactly one side has to be the `initiator`.
+    """
+    CIPHERS = ('chacha20', 'aesgcm')
+    SALT_SIZE = 16
+
+    def __init__(self, socket_: socket.socket, key: str, initiator: bool, cipher: str = 'chacha20',
+                 header: Optional[int] = None, codec: Codec = JSON, compression: Optional[Compression] = None):
+        super().__init__(socket_, header, codec, compression)
+
+        if cipher not in self.CIPHERS:
+            raise ValueError(f'Unknown cipher {cipher}, use one of {self.CIPHERS}')
+        self.cipher = cipher
+        self.initiator = initiator
+        self._key = base64.urlsafe_b64decode(key)
+        self._send_aead = None
+        self._recv_aead = None
+        self._send_counter = 0
+        self._recv_counter = 0
+
+        # the salt of the other side is read on first use, so both sides can be created on the same thread
+        self._salt = os.urandom(self.SALT_SIZE)
+        self._handshake_lock = Lock()
+        self.socket.sendall(self._salt)
+
+    def _handshake(self):
+        with self._handshake_lock:
+            if self._send_aead is not None:
+                return
+
+            from cryptography.hazmat.primitives import hashes
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+            from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+            peer_salt = bytearray()
+            while len(peer_salt) < self.SALT_SIZE:
+                chunk = self.socket.recv(self.SALT_SIZE - len(peer_salt))
+                if not chunk:
+                    raise ConnectionError('Connection closed during handshake')
+                peer_salt += chunk
+
+            salts = self._salt + peer_salt if self.initiator else bytes(peer_salt) + self._salt
+            keys = HKDF(
+                algorithm=hashes.SHA256(),
+                length=64,
+                salt=salts,
+                info=b'mcore.net.AEADNetwork ' + self.cipher.encode(),
+            ).derive(self._key)
+
+            aead = ChaCha20Poly1305 if self.cipher == 'chacha20' else AESGCM
+            initiator_key, responder_key = aead(keys[:32]), aead(keys[32:])
+            self._recv_aead = responder_key if self.initiator else initiator_key
+            self._send_aead = initiator_key if self.initiator else responder_key
+
+    def _recv_frame(self) -> Optional[memoryview]:
+        if self._recv_aead is None:
+            # the salt has to be read before the first frame
+            self._handshake()
+        return super()._recv_frame()
+
+    # --- security layer
+    def _unwrap(self, frame) -> bytes:
+        nonce = bytes(4) + self._recv_counter.to_bytes(8, 'big')
+        self._recv_counter += 1
+        return self._recv_aead.decrypt(nonce, frame, None)
+
+    def _wrap(self, data: bytes) -> bytes:
+        if self._send_aead is None:
+            self._handshake()
+        nonce = bytes(4) + self._send_counter.to_bytes(8, 'big')
+        self._send_counter += 1
+        return self._send_aead.encrypt(nonce, data, None)
+
+    # --- crypto
+    @staticmethod
+    def generate_key() -> str:
+        return base64.urlsafe_b64encode(os.urandom(32)).decode()
+
+
+class AIONetwork:
+    BUFFER = 2
+    ORDER: Literal["little", "big"] = 'big'
+
+    def __init__(self, reader: StreamReader, writer: StreamWriter, header: Optional[int] = None,
+                 codec: Codec = JSON, compression: Optional[Compression] = None):
+        self.reader: StreamReader = reader
+        self.writer: StreamWriter = writer
+        if header is not None:
+            self.BUFFER = header
+        self.codec = codec
+        self.compression = compression
+        self.metrics: Optional['NetworkMetrics'] = None
+        self._lock = asyncio.Lock()
+        self._send_lock = asyncio.Lock()
+        self._cork: Optional[bytearray] = None
+        self._flag = False
+
+    async def _read_header(self) -> int:
+        if self.BUFFER != VARINT:
+            raw_length = await self.reader.readexactly(self.BUFFER)
+            return int.from_bytes(raw_length, self.ORDER, signed=False)
+
+        raw_length = bytearray()
+        while True:
+            raw_length += await self.reader.readexactly(1)
+            length, _ = decode_header(raw_length, VARINT)
+            if length >= 0:
+                return length
+
+    async def _recv_frame(self) -> Optional[bytes]:
+        try:
+            length = await self._read_header()
+            if self.compression is None:
+                return await self.reader.readexactly(length)
+
+            self._flag = bool(length & 1)
+            return await self.reader.readexactly(length >> 1)
+        except asyncio.IncompleteReadError:
+            return None
+
+    async def _recv_data(self) -> Optional[bytes]:
+        async with self._lock:
+            data = await self._recv_frame()
+            if data is not None and self._flag:
+                return self.compression.decompress(data)
+            return data
+
+    async def _recv(self) -> str:
+        data = await self._recv_data()
+        if data is None:
+            return ''
+        return data.decode()
+
+    def _frame(self, data: bytes, out: bytearray):
+        length_shift, flag = _compress(self.compression, data)
+        if flag:
+            data = self.compression.compress(data)
+        out += _frame_header(len(data), length_shift, flag, self.BUFFER, self.ORDER)
+        out += data
+
+    async def _send_data(self, data: bytes):
+        if self._cork is not None:
+            self._frame(data, self._cork)
+            return
+
+        buffer = bytearray()
+        self._frame(data, buffer)
+        async with self._send_lock:
+            self.writer.write(buffer)
+            await self.writer.drain()
+
+    async def _send(self, msg: str):
+        await self._send_data(msg.encode())
+
+    @asynccontextmanager
+    async def batch(self):
+        """
+        Collects all packets sent within the context and flushes them with a single write and drain.
+
+        async with network.batch():
+            await network.send_pkg(a)
+            await network.send_pkg(b)
+        """
+        if self._cork is not None:
+            raise RuntimeError('Network is already batching')
+        self._cork = bytearray()
+        try:
+            yield self
+        finally:
+            buffer, self._cork = self._cork, None
+            if buffer:
+                async with self._send_lock:
+                    self.writer.write(buffer)
+                    await self.writer.drain()
+
+    async def send_many(self, packets: Iterable[Packet]):
+        """
+        Sends multiple packets as one buffer.
+        """
+        async with self.batch():
+            for packet in packets:
+                await self.send_pkg(packet)
+
+    async def negotiate_codec(self, codecs: Sequence[str] = ('binary', 'json')) -> Codec:
+        """
+        Exchanges supported codecs with the other side, which has to call `negotiate_codec` as well.
+        """
+        await self._send_json({'codecs': list(codecs)})
+        offer = await self._recv_json()
+        if offer is None:
+            raise ConnectionError('Connection closed during codec negotiation')
+        self.codec = select_codec(codecs, offer['codecs'])
+        if self.metrics is not None:
+            self.codec = self.metrics.timed_codec(self.codec)
+        return self.codec
+
+    async def _recv_json(self) -> Optional[dict]:
+        data = await self._recv()
+        if data:
+            return json.loads(data)
+        else:
+            return None
+
+    async def _send_json(self, data: Any):
+        await self._send(json.dumps(data, cls=EnhancedJSONEncoder))
+
+    async def recv_pkg(self) -> Optional[Union[Packet, PacketSchema]]:
+        data = await self._recv_data()
+        if not data:
+            return None
+
+        try:
+            return _as_packet(self.codec.decode(data))
+        except ValueError:
+            logger.exception(f'Could not decode packet with {self.codec.name} codec')
+            return None
+
+    async def send_pkg(self, data: Union[Packet, PacketSchema]):
+        await self._send_data(self.codec.encode(data))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
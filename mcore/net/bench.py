@@ -0,0 +1,220 @@
+"""
+Loopback benchmark for the transports in `mcore.net`.
+
+Measures throughput (one way stream of packets) and round trip latency (ping pong)
+for a matrix of transports, codecs, payload sizes, packet counts and concurrent connections.
+Results are written as JSON lines, which can be compared against an earlier run.
+
+python -m mcore.net.bench --payloads 16 1024 --count 1000 10000 --output before.jsonl
+python -m mcore.net.bench --payloads 16 1024 --count 1000 10000 --compare before.jsonl
+"""
+import argparse
+import asyncio
+import json
+import platform
+import socket
+import sys
+import time
+from itertools import product
+from threading import Thread
+from typing import List, Dict, Callable, Tuple, Optional, Iterable
+
+from mcore.net import Network, SecureNetwork, AEADNetwork, AIONetwork, Packet, CODECS
+
+VARIANTS = ('plain', 'secure', 'aead', 'async')
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def _network_pair(variant: str, codec: str) -> Tuple[Network, Network]:
+    a, b = socket.socketpair()
+    codec = CODECS[codec]
+    if variant == 'plain':
+        return Network(a, 4, codec), Network(b, 4, codec)
+    if variant == 'secure':
+        key = SecureNetwork.generate_key()
+        return SecureNetwork(a, key, 4, codec), SecureNetwork(b, key, 4, codec)
+    if variant == 'aead':
+        key = AEADNetwork.generate_key()
+        return AEADNetwork(a, key, True, header=4, codec=codec), AEADNetwork(b, key, False, header=4, codec=codec)
+    raise ValueError(f'Unknown variant {variant}')
+
+
+def _run_threads(target: Callable[[int], None], concurrency: int):
+    threads = [Thread(target=target, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def bench_sync(variant: str, codec: str, payload: int, count: int, concurrency: int) -> Dict:
+    packet = Packet('bench', data='x' * payload)
+    pairs = [_network_pair(variant, codec) for _ in range(concurrency)]
+    latencies: List[float] = []
+
+    # throughput
+    def stream(i: int):
+        sender, receiver = pairs[i]
+        thread = Thread(target=lambda: [receiver.recv_pkg() for _ in range(count)])
+        thread.start()
+        for _ in range(count):
+            sender.send_pkg(packet)
+        thread.join()
+
+    start = time.perf_counter()
+    _run_threads(stream, concurrency)
+    duration = time.perf_counter() - start
+
+    # latency
+    def ping_pong(i: int):
+        client, server = pairs[i]
+        rounds = max(1, count // 10)
+        thread = Thread(target=lambda: [server.send_pkg(server.recv_pkg()) for _ in range(rounds)])
+        thread.start()
+        for _ in range(rounds):
+            sent = time.perf_counter()
+            client.send_pkg(packet)
+            client.recv_pkg()
+            latencies.append(time.perf_counter() - sent)
+        thread.join()
+
+    _run_threads(ping_pong, concurrency)
+
+    for a, b in pairs:
+        a.close()
+        b.close()
+    return _result(variant, codec, payload, count, concurrency, duration, latencies)
+
+
+def bench_async(codec: str, payload: int, count: int, concurrency: int) -> Dict:
+    packet = Packet('bench', data='x' * payload)
+    latencies: List[float] = []
+
+    async def handle(reader, writer):
+        network = AIONetwork(reader, writer, 4, CODECS[codec])
+        mode = await network.recv_pkg()
+        for _ in range(mode.count):
+            pkg = await network.recv_pkg()
+            if mode.echo:
+                await network.send_pkg(pkg)
+        await network.send_pkg(Packet('done'))
+        await network.close()
+
+    async def client(port: int, echo: bool, rounds: int):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        network = AIONetwork(reader, writer, 4, CODECS[codec])
+        await network.send_pkg(Packet('mode', echo=echo, count=rounds))
+        if echo:
+            for _ in range(rounds):
+                sent = time.perf_counter()
+                await network.send_pkg(packet)
+                await network.recv_pkg()
+                latencies.append(time.perf_counter() - sent)
+        else:
+            for _ in range(rounds):
+                await network.send_pkg(packet)
+        await network.recv_pkg()
+        await network.close()
+
+    async def run() -> float:
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(port, False, count) for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+
+        await asyncio.gather(*(client(port, True, max(1, count // 10)) for _ in range(concurrency)))
+        server.close()
+        await server.wait_closed()
+        return duration
+
+    duration = asyncio.run(run())
+    return _result('async', codec, payload, count, concurrency, duration, latencies)
+
+
+def _result(variant: str, codec: str, payload: int, count: int, concurrency: int,
+            duration: float, latencies: List[float]) -> Dict:
+    messages = count * concurrency
+    return {
+        'variant': variant,
+        'codec': codec,
+        'payload': payload,
+        'count': count,
+        'concurrency': concurrency,
+        'msgs_per_sec': round(messages / duration, 1),
+        'mb_per_sec': round(messages * payload / duration / 1e6, 3),
+        'latency_p50_us': round(_percentile(latencies, 50) * 1e6, 1),
+        'latency_p99_us': round(_percentile(latencies, 99) * 1e6, 1),
+        'python': platform.python_version(),
+    }
+
+
+def run(variants: Iterable[str], codecs: Iterable[str], payloads: Iterable[int], counts: Iterable[int],
+        concurrency: Iterable[int]) -> Iterable[Dict]:
+    for variant in variants:
+        for codec in codecs:
+            for payload, count, c in product(payloads, counts, concurrency):
+                try:
+                    if variant == 'async':
+                        yield bench_async(codec, payload, count, c)
+                    else:
+                        yield bench_sync(variant, codec, payload, count, c)
+                except ImportError as e:
+                    print(f'Skip {variant}: {e}', file=sys.stderr)
+                    break
+
+
+def _key(result: Dict) -> Tuple:
+    return result['variant'], result['codec'], result['payload'], result['count'], result['concurrency']
+
+
+def compare(result: Dict, baseline: Optional[Dict]) -> str:
+    name = '{:6} {:6} payload={:<6} count={:<6} concurrency={:<3}'.format(*_key(result))
+    if baseline is None:
+        return f'{name} {result["msgs_per_sec"]:>12.1f} msg/s (no baseline)'
+    change = result['msgs_per_sec'] / baseline['msgs_per_sec'] - 1
+    return (f'{name} {result["msgs_per_sec"]:>12.1f} msg/s ({change:+.1%}), '
+            f'p99 {result["latency_p99_us"]:.1f}us (was {baseline["latency_p99_us"]:.1f}us)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument('--codecs', nargs='+', default=['json', 'binary'], choices=sorted(CODECS))
+    parser.add_argument('--payloads', nargs='+', type=int, default=[16, 1024, 16 * 1024])
+    parser.add_argument('--count', nargs='+', type=int, default=[5000])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--output', help='write results as JSON lines to this file')
+    parser.add_argument('--compare', help='JSON lines file of an earlier run')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {_key(r): r for r in map(json.loads, f) if r}
+
+    output = open(args.output, 'w') if args.output else None
+    try:
+        for result in run(args.variants, args.codecs, args.payloads, args.count, args.concurrency):
+            line = json.dumps(result)
+            if output:
+                output.write(line + '\n')
+                output.flush()
+            if args.compare:
+                print(compare(result, baseline.get(_key(result))))
+            else:
+                print(line)
+    finally:
+        if output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
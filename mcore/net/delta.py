@@ -0,0 +1,137 @@
+"""
+Delta compressed state snapshots.
+
+The sender keeps one `DeltaEncoder` per client and only sends entities and fields,
+which changed since the last snapshot acknowledged by the client.
+Works with lossy transports like `UDPNetwork`, lost snapshots are covered by the next delta.
+
+# server, every tick
+network.send_pkg(encoder.encode({entity_id: {'x': 1.0, 'y': 2.0}}))
+# server, on 'snapshot_ack' packets
+encoder.handle_ack(pkg)
+
+# client
+state = decoder.decode(pkg)  # {entity_id: {'x': 1.0, 'y': 2.0}} or None
+network.send_pkg(decoder.ack_packet())
+"""
+from typing import Dict, Hashable, Mapping, Any, Optional, List
+
+from mcore.net import Packet
+
+State = Dict[Hashable, Dict[str, Any]]
+
+
+def _copy(entities: Mapping[Hashable, Mapping[str, Any]]) -> State:
+    return {key: dict(fields) for key, fields in entities.items()}
+
+
+class DeltaEncoder:
+    """
+    Creates snapshot packets relative to the last snapshot acknowledged by the receiver.
+    Without an acknowledged snapshot in the history, a full snapshot is sent.
+    """
+
+    def __init__(self, type: str = 'snapshot', max_history: int = 32):
+        self.type = type
+        self.max_history = max_history
+        self._seq = 0
+        self._history: Dict[int, State] = {}
+        self._acked: Optional[int] = None
+
+    def encode(self, entities: Mapping[Hashable, Mapping[str, Any]]) -> Packet:
+        self._seq += 1
+        snapshot = _copy(entities)
+        self._history[self._seq] = snapshot
+        self._history.pop(self._seq - self.max_history, None)
+
+        base = self._history.get(self._acked) if self._acked is not None else None
+        if base is None:
+            return Packet(self.type, seq=self._seq, base=None, changed=list(map(list, snapshot.items())), removed=[])
+
+        changed: List[list] = []
+        removed = [key for key in base if key not in snapshot]
+        for key, fields in snapshot.items():
+            old = base.get(key)
+            if old is None:
+                changed.append([key, fields])
+            elif not old.keys() <= fields.keys():
+                # fields were removed, replace the whole entity
+                removed.append(key)
+                changed.append([key, fields])
+            else:
+                diff = {name: value for name, value in fields.items() if name not in old or old[name] != value}
+                if diff:
+                    changed.append([key, diff])
+
+        return Packet(self.type, seq=self._seq, base=self._acked, changed=changed, removed=removed)
+
+    def ack(self, seq: int):
+        if seq in self._history and (self._acked is None or seq > self._acked):
+            self._acked = seq
+            for old in [s for s in self._history if s < seq]:
+                del self._history[old]
+
+    def reset(self):
+        """
+        Next snapshot will be a full snapshot.
+        """
+        self._acked = None
+
+    def handle_ack(self, pkg: Packet):
+        if pkg.full:
+            self.reset()
+        elif pkg.seq is not None:
+            self.ack(pkg.seq)
+
+
+class DeltaDecoder:
+    """
+    Reconstructs full state from snapshot packets of a `DeltaEncoder`.
+    """
+
+    def __init__(self, max_history: int = 32):
+        self.max_history = max_history
+        self.state: State = {}
+        self.seq: Optional[int] = None
+        self._history: Dict[int, State] = {}
+        self._need_full = False
+
+    def decode(self, pkg: Packet) -> Optional[State]:
+        """
+        Returns the new state, or None for outdated snapshots and deltas to unknown base snapshots.
+        """
+        if self.seq is not None and pkg.seq <= self.seq:
+            return None
+
+        if pkg.base is None:
+            state: State = {}
+        else:
+            base = self._history.get(pkg.base)
+            if base is None:
+                self._need_full = True
+                return None
+            state = dict(base)
+
+        for key in pkg.removed:
+            state.pop(key, None)
+        for key, fields in pkg.changed:
+            if key in state:
+                entity = dict(state[key])
+                entity.update(fields)
+                state[key] = entity
+            else:
+                state[key] = fields
+
+        self.seq = pkg.seq
+        self.state = state
+        self._need_full = False
+        self._history[pkg.seq] = state
+        while len(self._history) > self.max_history:
+            del self._history[min(self._history)]
+        return state
+
+    def ack_packet(self, type: str = 'snapshot_ack') -> Packet:
+        """
+        Acknowledges the latest snapshot, or requests a full snapshot if a delta could not be applied.
+        """
+        return Packet(type, seq=self.seq, full=self._need_full)
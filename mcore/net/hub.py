@@ -0,0 +1,263 @@
+"""
+Asyncio server and client hub, which owns many `AIONetwork` connections.
+
+async def on_packet(client: HubClient, pkg):
+    if pkg.type == 'join':
+        hub.join(client, pkg.room)
+    else:
+        hub.broadcast(pkg, room=pkg.room, exclude=client)
+
+hub = Hub(on_packet=on_packet, policy=Hub.COALESCE)
+await hub.serve('0.0.0.0', 8080)
+"""
+import asyncio
+import logging
+from collections import deque
+from itertools import count
+from typing import Optional, Callable, Awaitable, Dict, Set, Deque, Tuple, List, Any, Iterable
+
+from mcore.net import AIONetwork, Codec, JSON, encode_header
+from mcore.net.metrics import NetworkMetrics
+
+logger = logging.getLogger(__name__)
+
+DROP = 'drop'
+DISCONNECT = 'disconnect'
+COALESCE = 'coalesce'
+
+
+class Outbox:
+    """
+    Bounded queue of framed packets for one client.
+    If full, `policy` decides what happens with a new frame:
+    - drop: the new frame is dropped
+    - disconnect: the client gets disconnected
+    - coalesce: replaces a queued frame with the same key (packet type), otherwise the oldest frame is dropped
+    """
+
+    def __init__(self, maxsize: int = 256, policy: str = DROP):
+        if policy not in (DROP, DISCONNECT, COALESCE):
+            raise ValueError(f'Unknown slow consumer policy {policy}')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._frames: Deque[Tuple[Any, bytes]] = deque()
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def put(self, key: Any, frame: bytes) -> bool:
+        """
+        Returns False if the client should be disconnected.
+        """
+        if len(self._frames) >= self.maxsize:
+            self.dropped += 1
+            if self.policy == DISCONNECT:
+                return False
+            if self.policy == DROP:
+                return True
+
+            for i, (queued_key, _) in enumerate(self._frames):
+                if queued_key == key:
+                    self._frames[i] = (key, frame)
+                    return True
+            self._frames.popleft()
+
+        self._frames.append((key, frame))
+        self._ready.set()
+        return True
+
+    async def take(self) -> List[bytes]:
+        """
+        Waits for frames and returns all queued frames.
+        """
+        while not self._frames:
+            self._ready.clear()
+            await self._ready.wait()
+        frames = [frame for _, frame in self._frames]
+        self._frames.clear()
+        return frames
+
+
+class HubClient:
+    def __init__(self, hub: 'Hub', network: AIONetwork, outbox: Outbox):
+        self.id = next(hub._ids)
+        self.hub = hub
+        self.network = network
+        self.outbox = outbox
+        self.rooms: Set[str] = set()
+        self.closed = False
+        self._writer_task: Optional[asyncio.Task] = None
+        self._reader_task: Optional[asyncio.Task] = None
+
+    def send(self, packet):
+        self.hub.send(self, packet)
+
+    async def close(self):
+        await self.hub.disconnect(self)
+
+    async def _write_loop(self):
+        writer = self.network.writer
+        try:
+            while True:
+                frames = await self.outbox.take()
+                writer.writelines(frames)
+                await writer.drain()
+        except ConnectionError:
+            asyncio.ensure_future(self.hub.disconnect(self))
+
+    def __repr__(self):
+        return f'HubClient({self.id})'
+
+
+class Hub:
+    """
+    Runs `asyncio.start_server` and manages connected clients in rooms.
+    Packets for clients are framed once and queued per client, a separate task writes the queue,
+    so slow clients do not block others.
+    """
+    DROP = DROP
+    DISCONNECT = DISCONNECT
+    COALESCE = COALESCE
+
+    def __init__(self,
+                 on_packet: Optional[Callable[[HubClient, Any], Awaitable]] = None,
+                 on_connect: Optional[Callable[[HubClient], Awaitable]] = None,
+                 on_disconnect: Optional[Callable[[HubClient], Awaitable]] = None,
+                 codec: Codec = JSON,
+                 header: int = AIONetwork.BUFFER,
+                 queue_size: int = 256,
+                 policy: str = DROP,
+                 metrics: Optional[NetworkMetrics] = None,
+                 ):
+        self.on_packet = on_packet
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.codec = codec
+        self.header = header
+        self.queue_size = queue_size
+        self.policy = policy
+        self.metrics = metrics
+        # hub frames bypass the codecs of the connections, so they are timed here
+        self._encode = metrics.timed_codec(codec).encode if metrics is not None else codec.encode
+
+        self.clients: Dict[int, HubClient] = {}
+        self.rooms: Dict[str, Set[HubClient]] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._ids = count(1)
+
+    # --- connections
+    async def serve(self, host: str, port: int) -> asyncio.AbstractServer:
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def connect(self, host: str, port: int) -> HubClient:
+        """
+        Opens a connection to another server and handles it like an accepted client.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        client = self._register(reader, writer)
+        client._reader_task = asyncio.ensure_future(self._read_loop(client))
+        return client
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = self._register(reader, writer)
+        await self._read_loop(client)
+
+    def _register(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> HubClient:
+        network = AIONetwork(reader, writer, self.header, self.codec)
+        if self.metrics is not None:
+            self.metrics.attach(network)
+        client = HubClient(self, network, Outbox(self.queue_size, self.policy))
+        client._writer_task = asyncio.ensure_future(client._write_loop())
+        self.clients[client.id] = client
+        return client
+
+    async def _read_loop(self, client: HubClient):
+        try:
+            if self.on_connect:
+                await self.on_connect(client)
+            while not client.closed:
+                pkg = await client.network.recv_pkg()
+                if pkg is None:
+                    break
+                if self.on_packet:
+                    await self.on_packet(client, pkg)
+        except ConnectionError:
+            pass
+        except Exception:
+            logger.exception(f'Error while handling {client}')
+        finally:
+            await self.disconnect(client)
+
+    async def disconnect(self, client: HubClient):
+        if client.closed:
+            return
+        client.closed = True
+
+        for room in list(client.rooms):
+            self.leave(client, room)
+        self.clients.pop(client.id, None)
+        if client._writer_task is not None:
+            client._writer_task.cancel()
+
+        try:
+            await client.network.close()
+        except ConnectionError:
+            pass
+
+        if self.on_disconnect:
+            await self.on_disconnect(client)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for client in list(self.clients.values()):
+            await self.disconnect(client)
+
+    # --- rooms
+    def join(self, client: HubClient, room: str):
+        self.rooms.setdefault(room, set()).add(client)
+        client.rooms.add(room)
+
+    def leave(self, client: HubClient, room: str):
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(client)
+            if not members:
+                del self.rooms[room]
+        client.rooms.discard(room)
+
+    # --- sending
+    def frame(self, packet) -> bytes:
+        data = self._encode(packet)
+        return encode_header(len(data), self.header, AIONetwork.ORDER) + data
+
+    def send(self, client: HubClient, packet):
+        self._enqueue(client, packet.type, self.frame(packet))
+
+    def broadcast(self, packet, room: Optional[str] = None, exclude: Optional[HubClient] = None):
+        """
+        Sends the packet to all clients of `room` or all clients, serializes the packet only once.
+        """
+        if room is None:
+            targets: Iterable[HubClient] = self.clients.values()
+        else:
+            targets = self.rooms.get(room, ())
+
+        frame = self.frame(packet)
+        for client in list(targets):
+            if client is not exclude:
+                self._enqueue(client, packet.type, frame)
+
+    def _enqueue(self, client: HubClient, key: Any, frame: bytes):
+        if client.closed:
+            return
+        if self.metrics is not None:
+            self.metrics.observe('queue_depth', len(client.outbox))
+            self.metrics.record_frame('out', len(frame))
+        if not client.outbox.put(key, frame):
+            logger.warning(f'Disconnect slow {client}')
+            asyncio.ensure_future(self.disconnect(client))
@@ -0,0 +1,244 @@
+"""
+Opt-in metrics for the transports in `mcore.net`.
+
+`attach` replaces methods of a single connection with measuring wrappers,
+connections without metrics run the unchanged code.
+
+metrics = NetworkMetrics(callback=print, interval=10)
+metrics.attach(network)
+...
+snapshot = metrics.snapshot()
+snapshot.counters['bytes_out'], snapshot.histograms['encode_us'].percentile(99)
+"""
+import asyncio
+import dataclasses
+import time
+from collections import defaultdict
+from functools import wraps
+from time import perf_counter
+from typing import Dict, Optional, Callable, List
+
+from mcore.net import Codec, Network
+
+
+class Histogram:
+    """
+    Histogram with power of two buckets, bucket i counts values below 2**i.
+    """
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * 64
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.buckets[min(int(value).bit_length(), 63)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Upper bound of the bucket containing the p-th percentile.
+        """
+        threshold = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= threshold:
+                return min(float(2 ** i), self.max)
+        return 0.0
+
+    def copy(self) -> 'Histogram':
+        other = Histogram()
+        other.buckets = list(self.buckets)
+        other.count, other.total, other.max = self.count, self.total, self.max
+        return other
+
+
+@dataclasses.dataclass
+class MetricsSnapshot:
+    """
+    Copy of all metrics, timings are in microseconds.
+    """
+    time: float
+    counters: Dict[str, int]
+    histograms: Dict[str, Histogram]
+
+
+class _TimedLock:
+    __slots__ = ('lock', 'histogram')
+
+    def __init__(self, lock, histogram: Histogram):
+        self.lock = lock
+        self.histogram = histogram
+
+    def __enter__(self):
+        start = perf_counter()
+        self.lock.acquire()
+        self.histogram.add((perf_counter() - start) * 1e6)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.lock.release()
+
+    async def __aenter__(self):
+        start = perf_counter()
+        await self.lock.acquire()
+        self.histogram.add((perf_counter() - start) * 1e6)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.lock.release()
+
+
+class _TimedCodec(Codec):
+    def __init__(self, codec: Codec, metrics: 'NetworkMetrics'):
+        self.codec = codec
+        self.name = codec.name
+        self.metrics = metrics
+
+    def encode(self, data):
+        start = perf_counter()
+        encoded = self.codec.encode(data)
+        metrics = self.metrics
+        metrics.observe('encode_us', (perf_counter() - start) * 1e6)
+        _type = getattr(data, 'type', None)
+        metrics.count(f'packets_out.{_type}')
+        metrics.count(f'bytes_out.{_type}', len(encoded))
+        return encoded
+
+    def decode(self, data):
+        start = perf_counter()
+        decoded = self.codec.decode(data)
+        metrics = self.metrics
+        metrics.observe('decode_us', (perf_counter() - start) * 1e6)
+        _type = decoded.get('type') if isinstance(decoded, dict) else getattr(decoded, 'type', None)
+        metrics.count(f'packets_in.{_type}')
+        metrics.count(f'bytes_in.{_type}', len(data))
+        return decoded
+
+
+class NetworkMetrics:
+    """
+    Counters and histograms of one or more connections.
+
+    Counters: frames_in/out, bytes_in/out (frames incl. header),
+    packets_in/out.<type>, bytes_in/out.<type> (serialized packets, a `Hub` broadcast is serialized once)
+    Histograms: frame_size_in/out, encode_us, decode_us, encrypt_us, decrypt_us, compress_us, decompress_us,
+    recv_lock_wait_us, send_lock_wait_us, rtt_us (`RPC`), queue_depth (`Hub`)
+
+    `callback` is called with a snapshot at most every `interval` seconds, while frames are transferred.
+    """
+
+    def __init__(self, callback: Optional[Callable[[MetricsSnapshot], None]] = None, interval: float = 1.0):
+        self.callback = callback
+        self.interval = interval
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.histograms: Dict[str, Histogram] = defaultdict(Histogram)
+        self._next_report = time.monotonic() + interval
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def observe(self, name: str, value: float):
+        self.histograms[name].add(value)
+
+    def snapshot(self) -> MetricsSnapshot:
+        return MetricsSnapshot(
+            time=time.time(),
+            counters=dict(self.counters),
+            histograms={name: h.copy() for name, h in list(self.histograms.items())},
+        )
+
+    def reset(self):
+        self.counters.clear()
+        for histogram in self.histograms.values():
+            # instrumented connections keep references to the histograms
+            histogram.__init__()
+
+    def record_frame(self, direction: str, size: int):
+        """
+        Counts a frame of `size` bytes incl. header, `direction` is 'in' or 'out'.
+        """
+        counters = self.counters
+        counters['frames_' + direction] += 1
+        counters['bytes_' + direction] += size
+        self.histograms['frame_size_' + direction].add(size)
+
+        if self.callback is not None and time.monotonic() >= self._next_report:
+            self._next_report = time.monotonic() + self.interval
+            self.callback(self.snapshot())
+
+    # --- instrumentation
+    def timed_codec(self, codec: Codec) -> Codec:
+        if isinstance(codec, _TimedCodec):
+            codec = codec.codec
+        return _TimedCodec(codec, self)
+
+    def _timed(self, name: str, func: Callable) -> Callable:
+        histogram = self.histograms[name]
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.add((perf_counter() - start) * 1e6)
+
+        return timed
+
+    def attach(self, network):
+        """
+        Instruments a `Network`, `SecureNetwork`, `AEADNetwork` or `AIONetwork`.
+        """
+        network.metrics = self
+        network.codec = self.timed_codec(network.codec)
+        network._lock = _TimedLock(network._lock, self.histograms['recv_lock_wait_us'])
+        network._send_lock = _TimedLock(network._send_lock, self.histograms['send_lock_wait_us'])
+
+        if network.compression is not None:
+            compression = network.compression
+            compression.compress = self._timed('compress_us', compression.compress)
+            compression.decompress = self._timed('decompress_us', compression.decompress)
+
+        # only encrypting subclasses transform frames, the identity of Network stays unmeasured
+        if getattr(type(network), '_wrap', Network._wrap) is not Network._wrap:
+            network._wrap = self._timed('encrypt_us', network._wrap)
+            network._unwrap = self._timed('decrypt_us', network._unwrap)
+
+        frame = network._frame
+
+        @wraps(frame)
+        def counted_frame(data, out: bytearray):
+            size = len(out)
+            frame(data, out)
+            self.record_frame('out', len(out) - size)
+
+        network._frame = counted_frame
+
+        recv_frame = network._recv_frame
+        header = network.BUFFER or 1
+        if asyncio.iscoroutinefunction(recv_frame):
+            @wraps(recv_frame)
+            async def counted_recv_frame():
+                received = await recv_frame()
+                if received is not None:
+                    self.record_frame('in', len(received) + header)
+                return received
+        else:
+            @wraps(recv_frame)
+            def counted_recv_frame():
+                received = recv_frame()
+                if received is not None:
+                    self.record_frame('in', len(received) + header)
+                return received
+
+        network._recv_frame = counted_recv_frame
+        return network
@@ -0,0 +1,196 @@
+"""
+Records packet streams of connections and replays them for load tests.
+
+The log stores the serialized packets (codec output) with timestamps,
+a replay sends them through the framing (compression, encryption) of the target connection
+without serializing them again.
+
+with Recorder('traffic.mcrec') as recorder:
+    recorder.attach(network)
+    ...
+
+with Replayer('traffic.mcrec') as replayer:
+    # 10x speed against 500 simulated clients
+    await asyncio.gather(*(replayer.replay_async(n, speed=10) for n in networks))
+"""
+import asyncio
+import mmap
+import struct
+import time
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Union, Iterator, Tuple, Optional, Sequence
+
+MAGIC = b'MCREC\x01'
+# time offset in seconds, direction, payload length
+_RECORD = struct.Struct('>dBI')
+
+IN = 0
+OUT = 1
+
+
+class Recorder:
+    """
+    Appends serialized packets of attached connections to a binary log.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, 'ab')
+        if new:
+            self._file.write(MAGIC)
+        self._start = time.monotonic()
+        self._lock = Lock()
+
+    def write(self, direction: int, data):
+        with self._lock:
+            self._file.write(_RECORD.pack(time.monotonic() - self._start, direction, len(data)))
+            self._file.write(data)
+
+    def attach(self, network, directions: Sequence[int] = (IN, OUT)):
+        """
+        Records packets sent and received by a `Network` or `AIONetwork`.
+        """
+        if OUT in directions:
+            send_data = network._send_data
+            if asyncio.iscoroutinefunction(send_data):
+                async def recording_send_data(data):
+                    self.write(OUT, data)
+                    await send_data(data)
+            else:
+                def recording_send_data(data):
+                    self.write(OUT, data)
+                    send_data(data)
+            network._send_data = recording_send_data
+
+        if IN in directions:
+            if hasattr(network, '_recv_decoded'):
+                recv_decoded = network._recv_decoded
+
+                def recording_recv_decoded(decode):
+                    def capture(data):
+                        self.write(IN, data)
+                        return decode(data)
+
+                    return recv_decoded(capture)
+
+                network._recv_decoded = recording_recv_decoded
+            else:
+                recv_data = network._recv_data
+
+                async def recording_recv_data():
+                    data = await recv_data()
+                    if data is not None:
+                        self.write(IN, data)
+                    return data
+
+                network._recv_data = recording_recv_data
+        return network
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Replayer:
+    """
+    Memory maps a log of a `Recorder` and sends its packets onto connections.
+    Replays send directly from the mapped log, `records` returns copies of the payloads.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if self._view[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a packet log')
+
+    def records(self, direction: Optional[int] = OUT) -> Iterator[Tuple[float, int, bytes]]:
+        """
+        Yields (time offset, direction, payload) of the records, filtered by direction if given.
+        """
+        data = self._mmap
+        for offset, record_direction, pos, length in self._index(direction):
+            yield offset, record_direction, data[pos:pos + length]
+
+    def _index(self, direction: Optional[int]) -> Iterator[Tuple[float, int, int, int]]:
+        # (time offset, direction, position, length), no views are held between records
+        view = self._view
+        pos = len(MAGIC)
+        end = len(view)
+        while pos + _RECORD.size <= end:
+            offset, record_direction, length = _RECORD.unpack_from(view, pos)
+            pos += _RECORD.size
+            if direction is None or record_direction == direction:
+                yield offset, record_direction, pos, length
+            pos += length
+
+    def replay(self, network, speed: Optional[float] = 1.0, direction: int = OUT) -> int:
+        """
+        Sends the records with their original timing divided by `speed`, as fast as possible if speed is None.
+        Returns the number of sent packets.
+        """
+        start = time.monotonic()
+        sent = 0
+        view = self._view
+        for offset, _, pos, length in self._index(direction):
+            if speed:
+                delay = start + offset / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            # released right away, exported views would prevent closing the mmap
+            with view[pos:pos + length] as payload:
+                network._send_data(payload)
+            sent += 1
+        return sent
+
+    async def replay_async(self, network, speed: Optional[float] = 1.0, direction: int = OUT) -> int:
+        """
+        Like `replay` for `AIONetwork`.
+        """
+        start = time.monotonic()
+        sent = 0
+        view = self._view
+        for offset, _, pos, length in self._index(direction):
+            if speed:
+                delay = start + offset / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            with view[pos:pos + length] as payload:
+                await network._send_data(payload)
+            sent += 1
+        return sent
+
+    def fan_out(self, networks: Sequence, speed: Optional[float] = 1.0, direction: int = OUT):
+        """
+        Replays the log onto many `Network` connections concurrently, one thread per connection.
+        """
+        threads = [Thread(target=self.replay, args=(network, speed, direction)) for network in networks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
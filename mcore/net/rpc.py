@@ -0,0 +1,288 @@
+"""
+Request/response calls over a single `Network` or `AIONetwork` connection.
+
+Requests carry a correlation id, a single reader routes replies to the waiting caller,
+so many calls can be in flight at once.
+
+def handle(pkg: Packet) -> Packet:
+    return Packet('pong', value=pkg.value)
+
+server = RPC(Network(server_socket), handler=handle).start()
+client = RPC(Network(client_socket)).start()
+reply = client.call(Packet('ping', value=1), timeout=1)
+"""
+import asyncio
+import logging
+import socket
+from time import perf_counter
+from concurrent.futures import Future
+from itertools import count
+from threading import Thread, Lock
+from typing import Optional, Callable, Dict, Awaitable, Tuple
+
+from mcore.net import Network, AIONetwork, Packet
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID = 'rid'
+REPLY_ID = 'reply_to'
+
+
+class RPCError(Exception):
+    """
+    Raised for calls, which failed on the remote side.
+    """
+
+
+def _error_reply(rid: int, e: Exception) -> Packet:
+    return Packet('error', **{REPLY_ID: rid, 'error': f'{type(e).__name__}: {e}'})
+
+
+def _check_packet(pkg, kind: str):
+    # correlation ids are stored as packet fields, which schema packets do not have
+    if not isinstance(pkg, dict):
+        raise TypeError(f'RPC {kind} has to be a Packet, got {type(pkg).__name__}')
+
+
+def _request_packet(pkg: Packet, rid: int) -> Packet:
+    # a copy, the same packet can be sent by concurrent calls
+    request = Packet(**pkg)
+    request[REQUEST_ID] = rid
+    return request
+
+
+def _set_result(future, pkg: Packet):
+    if pkg.type == 'error':
+        future.set_exception(RPCError(pkg.error))
+    else:
+        future.set_result(pkg)
+
+
+class RPC:
+    """
+    RPC on top of a `Network`, the reader thread owns `recv_pkg` of the connection.
+
+    Incoming requests are answered with the return value of `handler`, which runs on the reader thread.
+    Packets which are neither requests nor replies (incl. `PacketSchema` packets) are passed to `on_packet`.
+    Requests and replies have to be `Packet`s. Errors of `on_packet` and of sending replies are logged.
+    """
+
+    def __init__(self,
+                 network: Network,
+                 handler: Optional[Callable[[Packet], Optional[Packet]]] = None,
+                 on_packet: Optional[Callable[[Packet], None]] = None):
+        self.network = network
+        self.handler = handler
+        self.on_packet = on_packet
+        self._ids = count(1)
+        self._pending: Dict[int, Future] = {}
+        self._lock = Lock()
+        self._reader: Optional[Thread] = None
+
+    def start(self) -> 'RPC':
+        self._reader = Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        return self
+
+    def request(self, pkg: Packet) -> Future:
+        """
+        Sends the request without waiting for the reply.
+        """
+        return self._request(pkg)[1]
+
+    def _request(self, pkg: Packet) -> Tuple[int, Future]:
+        _check_packet(pkg, 'request')
+        rid = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[rid] = future
+        try:
+            self.network.send_pkg(_request_packet(pkg, rid))
+        except Exception:
+            with self._lock:
+                self._pending.pop(rid, None)
+            raise
+        return rid, future
+
+    def call(self, pkg: Packet, timeout: Optional[float] = None) -> Packet:
+        """
+        :raises concurrent.futures.TimeoutError: if no reply arrived within `timeout` seconds
+        :raises RPCError: if the request failed on the remote side
+        """
+        start = perf_counter()
+        rid, future = self._request(pkg)
+        try:
+            reply = future.result(timeout)
+            if self.network.metrics is not None:
+                self.network.metrics.observe('rtt_us', (perf_counter() - start) * 1e6)
+            return reply
+        finally:
+            with self._lock:
+                self._pending.pop(rid, None)
+
+    def _read_loop(self):
+        try:
+            while True:
+                pkg = self.network.recv_pkg()
+                if pkg is None:
+                    break
+                try:
+                    self._route(pkg)
+                except Exception:
+                    logger.exception(f'RPC failed to handle {type(pkg).__name__} packet')
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._fail_pending()
+
+    def _route(self, pkg: Packet):
+        if not isinstance(pkg, dict):
+            if self.on_packet is not None:
+                self.on_packet(pkg)
+            return
+
+        rid = pkg.get(REPLY_ID)
+        if rid is not None:
+            with self._lock:
+                future = self._pending.pop(rid, None)
+            if future is not None:
+                _set_result(future, pkg)
+            return
+
+        rid = pkg.get(REQUEST_ID)
+        if rid is not None and self.handler is not None:
+            try:
+                reply = self.handler(pkg) or Packet('ack')
+                _check_packet(reply, 'reply')
+            except Exception as e:
+                logger.exception(f'RPC handler failed for {pkg.type}')
+                reply = _error_reply(rid, e)
+            reply[REPLY_ID] = rid
+            self.network.send_pkg(reply)
+        elif self.on_packet is not None:
+            self.on_packet(pkg)
+
+    def _fail_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(ConnectionError('Connection closed'))
+
+    def close(self):
+        try:
+            # wakes up the reader thread
+            self.network.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.network.close()
+        if self._reader is not None:
+            self._reader.join()
+
+
+class AIORPC:
+    """
+    Like `RPC` for `AIONetwork`, handlers are coroutines and run as separate tasks.
+    """
+
+    def __init__(self,
+                 network: AIONetwork,
+                 handler: Optional[Callable[[Packet], Awaitable[Optional[Packet]]]] = None,
+                 on_packet: Optional[Callable[[Packet], Awaitable]] = None):
+        self.network = network
+        self.handler = handler
+        self.on_packet = on_packet
+        self._ids = count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader: Optional[asyncio.Task] = None
+
+    def start(self) -> 'AIORPC':
+        self._reader = asyncio.ensure_future(self._read_loop())
+        return self
+
+    async def request(self, pkg: Packet) -> asyncio.Future:
+        """
+        Sends the request without waiting for the reply.
+        """
+        return (await self._request(pkg))[1]
+
+    async def _request(self, pkg: Packet) -> Tuple[int, asyncio.Future]:
+        _check_packet(pkg, 'request')
+        rid = next(self._ids)
+        future = asyncio.get_event_loop().create_future()
+        self._pending[rid] = future
+        try:
+            await self.network.send_pkg(_request_packet(pkg, rid))
+        except Exception:
+            self._pending.pop(rid, None)
+            raise
+        return rid, future
+
+    async def call(self, pkg: Packet, timeout: Optional[float] = None) -> Packet:
+        """
+        :raises asyncio.TimeoutError: if no reply arrived within `timeout` seconds
+        :raises RPCError: if the request failed on the remote side
+        """
+        start = perf_counter()
+        rid, future = await self._request(pkg)
+        try:
+            reply = await asyncio.wait_for(future, timeout)
+            if self.network.metrics is not None:
+                self.network.metrics.observe('rtt_us', (perf_counter() - start) * 1e6)
+            return reply
+        finally:
+            self._pending.pop(rid, None)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                pkg = await self.network.recv_pkg()
+                if pkg is None:
+                    break
+                try:
+                    await self._route(pkg)
+                except Exception:
+                    logger.exception(f'RPC failed to handle {type(pkg).__name__} packet')
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('Connection closed'))
+
+    async def _route(self, pkg: Packet):
+        if not isinstance(pkg, dict):
+            if self.on_packet is not None:
+                await self.on_packet(pkg)
+            return
+
+        rid = pkg.get(REPLY_ID)
+        if rid is not None:
+            future = self._pending.pop(rid, None)
+            if future is not None and not future.done():
+                _set_result(future, pkg)
+            return
+
+        rid = pkg.get(REQUEST_ID)
+        if rid is not None and self.handler is not None:
+            asyncio.ensure_future(self._handle(rid, pkg))
+        elif self.on_packet is not None:
+            await self.on_packet(pkg)
+
+    async def _handle(self, rid: int, pkg: Packet):
+        try:
+            reply = await self.handler(pkg) or Packet('ack')
+            _check_packet(reply, 'reply')
+        except Exception as e:
+            logger.exception(f'RPC handler failed for {pkg.type}')
+            reply = _error_reply(rid, e)
+        reply[REPLY_ID] = rid
+        try:
+            await self.network.send_pkg(reply)
+        except Exception:
+            logger.exception(f'RPC failed to send reply for {pkg.type}')
+
+    async def close(self):
+        await self.network.close()
+        if self._reader is not None:
+            await self._reader
@@ -0,0 +1,219 @@
+"""
+Simulates network conditions (latency, jitter, bandwidth, loss, reordering) in process.
+
+Wrap the sending side of a connection, decisions are deterministic for a given seed.
+
+conditions = Conditions(latency=0.05, jitter=0.01, bandwidth=64_000, seed=1)
+network = Network(SimulatedSocket(sock, conditions))
+
+reader, writer = await asyncio.open_connection(host, port)
+network = AIONetwork(reader, SimulatedStreamWriter(writer, conditions))
+
+Loss and reordering only apply to datagram sockets, streams keep their byte order.
+"""
+import asyncio
+import dataclasses
+import heapq
+import random
+import socket
+import time
+from collections import deque
+from itertools import count
+from threading import Thread, Condition
+from typing import Optional, List, Tuple, Deque
+
+
+@dataclasses.dataclass
+class Conditions:
+    """
+    :param latency: one way delay in seconds
+    :param jitter: maximum additional random delay in seconds
+    :param bandwidth: bytes per second, None for unlimited
+    :param loss: probability to drop a datagram
+    :param reorder: probability to delay a datagram, so it arrives after later ones
+    :param seed: seed for all random decisions
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    bandwidth: Optional[float] = None
+    loss: float = 0.0
+    reorder: float = 0.0
+    seed: Optional[int] = None
+
+
+class _Link:
+    """
+    Computes delivery times for sent data.
+    """
+
+    def __init__(self, conditions: Conditions, ordered: bool):
+        self.conditions = conditions
+        self.ordered = ordered
+        self.random = random.Random(conditions.seed)
+        self._free_at = 0.0
+        self._last_due = 0.0
+
+    def due(self, now: float, size: int) -> Optional[float]:
+        """
+        Returns the delivery time or None if the data is lost.
+        """
+        c = self.conditions
+        if not self.ordered and c.loss and self.random.random() < c.loss:
+            return None
+
+        sent = now
+        if c.bandwidth:
+            self._free_at = max(now, self._free_at) + size / c.bandwidth
+            sent = self._free_at
+
+        due = sent + c.latency
+        if c.jitter:
+            due += self.random.uniform(0, c.jitter)
+        if not self.ordered and c.reorder and self.random.random() < c.reorder:
+            due += c.latency + c.jitter + 0.001
+
+        if self.ordered:
+            due = max(due, self._last_due)
+            self._last_due = due
+        return due
+
+
+class SimulatedSocket:
+    """
+    Socket wrapper, which delivers sent data from a background thread when it is due.
+    All other socket methods are passed through.
+    """
+
+    def __init__(self, sock: socket.socket, conditions: Conditions):
+        self.socket = sock
+        self.conditions = conditions
+        self._link = _Link(conditions, ordered=sock.type != socket.SOCK_DGRAM)
+        self._queue: List[Tuple[float, int, bytes]] = []
+        self._ids = count()
+        self._condition = Condition()
+        self._closed = False
+        self._thread = Thread(target=self._deliver, daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, item):
+        return getattr(self.socket, item)
+
+    def send(self, data) -> int:
+        due = self._link.due(time.monotonic(), len(data))
+        if due is not None:
+            with self._condition:
+                heapq.heappush(self._queue, (due, next(self._ids), bytes(data)))
+                self._condition.notify()
+        return len(data)
+
+    def sendall(self, data):
+        self.send(data)
+
+    def _deliver(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._queue:
+                        if self._closed:
+                            return
+                        self._condition.wait()
+                        continue
+                    delay = self._queue[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                _, _, data = heapq.heappop(self._queue)
+
+            try:
+                if self.socket.type == socket.SOCK_DGRAM:
+                    self.socket.send(data)
+                else:
+                    self.socket.sendall(data)
+            except ConnectionRefusedError:
+                # datagram peer not listening
+                continue
+            except OSError:
+                return
+
+    def flush(self, timeout: Optional[float] = None):
+        """
+        Waits until all sent data is delivered.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.001)
+
+    def shutdown(self, how: int):
+        with self._condition:
+            self._queue.clear()
+            self._closed = True
+            self._condition.notify()
+        self.socket.shutdown(how)
+
+    def close(self):
+        """
+        Delivers pending data and closes the socket.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.socket.close()
+
+
+class SimulatedStreamWriter:
+    """
+    `asyncio.StreamWriter` wrapper for `AIONetwork`, which delivers written data when it is due.
+    `close` delivers pending data before closing the underlying writer.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, conditions: Conditions):
+        self.writer = writer
+        self.conditions = conditions
+        self._link = _Link(conditions, ordered=True)
+        self._queue: Deque[Tuple[float, bytes]] = deque()
+        self._ready = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.ensure_future(self._deliver())
+
+    def __getattr__(self, item):
+        return getattr(self.writer, item)
+
+    def write(self, data):
+        due = self._link.due(time.monotonic(), len(data))
+        self._queue.append((due, bytes(data)))
+        self._ready.set()
+
+    def writelines(self, data):
+        self.write(b''.join(data))
+
+    async def drain(self):
+        await self.writer.drain()
+
+    async def _deliver(self):
+        while True:
+            while not self._queue:
+                if self._closing:
+                    self.writer.close()
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+
+            due, data = self._queue[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._queue.popleft()
+            self.writer.write(data)
+            await self.writer.drain()
+
+    def close(self):
+        self._closing = True
+        self._ready.set()
+
+    def is_closing(self) -> bool:
+        return self._closing or self.writer.is_closing()
+
+    async def wait_closed(self):
+        await self._task
+        await self.writer.wait_closed()
@@ -0,0 +1,315 @@
+"""
+Unreliable sequenced datagram transport with optional reliable messages.
+
+sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+sock.bind(('0.0.0.0', 8081))
+sock.connect(peer_address)
+
+with UDPNetwork(sock) as network:
+    with network.batch():
+        network.send_pkg(position)
+        network.send_pkg(chat, reliable=True)
+
+    pkg = network.recv_pkg(timeout=0.01)
+    network.update()  # once per tick, resends unacknowledged reliable messages
+"""
+import logging
+import socket
+import struct
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock
+from typing import Optional, Dict, List, Deque, Tuple, Union
+
+from mcore.net import Packet, PacketSchema, Codec, JSON, _as_packet, _write_uvarint, _read_uvarint
+
+logger = logging.getLogger(__name__)
+
+# seq, ack, ack bits
+_HEADER = struct.Struct('>III')
+_RELIABLE_ID = struct.Struct('>I')
+_UNRELIABLE, _RELIABLE = 0, 1
+_SEQ_MASK = 0xFFFFFFFF
+_ACK_BITS = 32
+# sent datagrams with reliable packets are tracked for acks within this many sequence numbers
+_SENT_WINDOW = 1024
+
+
+def newer(a: int, b: int) -> bool:
+    """
+    Sequence number comparison with wrap around.
+    """
+    return a != b and ((a - b) & _SEQ_MASK) < 0x80000000
+
+
+class _Reliable:
+    __slots__ = ('id', 'message', 'sent_at')
+
+    def __init__(self, id: int, message: bytes):
+        self.id = id
+        self.message = message
+        self.sent_at = 0.0
+
+
+class UDPNetwork:
+    """
+    Packets over a connected datagram socket.
+
+    Every datagram carries a sequence number and acknowledges the last 33 datagrams of the peer.
+    Unreliable packets from datagrams older than the newest received one are dropped.
+    Reliable packets are resent after `resend_after` seconds until acknowledged and delivered in order.
+    Packets sent within `batch()` are packed into as few datagrams of at most `mtu` bytes as possible.
+    Truncated or malformed datagrams are discarded, `dropped` counts them along with the stale packets.
+    """
+
+    def __init__(self, sock: socket.socket, codec: Codec = JSON, mtu: int = 1200, resend_after: float = 0.1):
+        self.socket = sock
+        self.codec = codec
+        self.mtu = mtu
+        self.resend_after = resend_after
+
+        self._send_lock = Lock()
+        self._cork: Optional[List[bytes]] = None
+
+        # outgoing, sequence 0 is never sent and means nothing to acknowledge
+        self._seq = 1
+        self._next_reliable_id = 0
+        self._unacked: Dict[int, _Reliable] = {}
+        self._sent: Dict[int, List[int]] = {}
+
+        # incoming
+        self._remote_seq: Optional[int] = None
+        self._ack_bits = 0
+        self._ack_pending = False
+        self._next_expected_id = 0
+        self._reliable_in: Dict[int, bytes] = {}
+        self._inbox: Deque[bytes] = deque()
+
+        self.dropped = 0
+
+    # --- sending
+    def _message(self, kind: int, payload: bytes, reliable_id: int = 0) -> bytes:
+        out = bytearray([kind])
+        if kind == _RELIABLE:
+            out += _RELIABLE_ID.pack(reliable_id)
+        _write_uvarint(out, len(payload))
+        out += payload
+        return bytes(out)
+
+    def send_pkg(self, data: Union[Packet, PacketSchema], reliable: bool = False):
+        payload = self.codec.encode(data)
+        with self._send_lock:
+            if reliable:
+                entry = _Reliable(self._next_reliable_id, b'')
+                entry.message = self._message(_RELIABLE, payload, entry.id)
+                self._next_reliable_id = (self._next_reliable_id + 1) & _SEQ_MASK
+                self._unacked[entry.id] = entry
+                message = None
+            else:
+                message = self._message(_UNRELIABLE, payload)
+
+            if self._cork is not None:
+                if message is not None:
+                    self._cork.append(message)
+                return
+            self._flush([message] if message is not None else [])
+
+    @contextmanager
+    def batch(self):
+        """
+        Packs all packets sent within the context into as few datagrams as possible.
+        """
+        with self._send_lock:
+            if self._cork is not None:
+                raise RuntimeError('Network is already batching')
+            self._cork = []
+        try:
+            yield self
+        finally:
+            with self._send_lock:
+                messages, self._cork = self._cork, None
+                self._flush(messages)
+
+    def update(self):
+        """
+        Resends due reliable packets and acknowledges received datagrams, should be called regularly.
+        """
+        with self._send_lock:
+            self._flush([])
+
+    def _flush(self, messages: List[bytes]):
+        now = time.monotonic()
+        reliable = [entry for entry in self._unacked.values() if now - entry.sent_at >= self.resend_after]
+
+        datagrams: List[Tuple[bytearray, List[int]]] = []
+        datagram, ids = bytearray(_HEADER.size), []
+        for message, reliable_id in [(e.message, e.id) for e in reliable] + [(m, None) for m in messages]:
+            if len(datagram) > _HEADER.size and len(datagram) + len(message) > self.mtu:
+                datagrams.append((datagram, ids))
+                datagram, ids = bytearray(_HEADER.size), []
+            datagram += message
+            if reliable_id is not None:
+                ids.append(reliable_id)
+
+        if len(datagram) > _HEADER.size or self._ack_pending:
+            datagrams.append((datagram, ids))
+
+        for entry in reliable:
+            entry.sent_at = now
+        for datagram, ids in datagrams:
+            self._send_datagram(datagram, ids)
+
+    def _send_datagram(self, datagram: bytearray, reliable_ids: List[int]):
+        seq = self._seq
+        self._seq = ((self._seq + 1) & _SEQ_MASK) or 1
+        _HEADER.pack_into(datagram, 0, seq, self._remote_seq or 0, self._ack_bits)
+        sent = self._sent
+        # ordered by sequence, datagrams outside the window are not acknowledged anymore, their packets are resent
+        while sent:
+            oldest = next(iter(sent))
+            if ((seq - oldest) & _SEQ_MASK) < _SENT_WINDOW:
+                break
+            del sent[oldest]
+        if reliable_ids:
+            sent[seq] = reliable_ids
+        self._ack_pending = False
+        try:
+            self.socket.send(datagram)
+        except ConnectionRefusedError:
+            # peer not (yet) listening, reliable packets will be resent
+            pass
+
+    # --- receiving
+    def recv_pkg(self, timeout: Optional[float] = None) -> Optional[Union[Packet, PacketSchema]]:
+        """
+        Returns the next packet, or None if nothing arrived within `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._inbox:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.socket.settimeout(remaining)
+            else:
+                self.socket.settimeout(None)
+
+            try:
+                datagram = self.socket.recv(65535)
+            except (socket.timeout, ConnectionRefusedError):
+                continue
+            self._receive_datagram(datagram)
+
+        return _as_packet(self.codec.decode(self._inbox.popleft()))
+
+    @staticmethod
+    def _parse(datagram: bytes) -> Optional[List[Tuple[Optional[int], bytes]]]:
+        """
+        Returns the (reliable id, payload) messages of the datagram, None if it is malformed.
+        """
+        messages = []
+        pos = _HEADER.size
+        try:
+            while pos < len(datagram):
+                kind = datagram[pos]
+                pos += 1
+                reliable_id = None
+                if kind == _RELIABLE:
+                    reliable_id, = _RELIABLE_ID.unpack_from(datagram, pos)
+                    pos += _RELIABLE_ID.size
+                elif kind != _UNRELIABLE:
+                    return None
+                length, pos = _read_uvarint(datagram, pos)
+                if pos + length > len(datagram):
+                    return None
+                messages.append((reliable_id, datagram[pos:pos + length]))
+                pos += length
+        except (IndexError, struct.error):
+            return None
+        return messages
+
+    def _receive_datagram(self, datagram: bytes):
+        messages = self._parse(datagram) if len(datagram) >= _HEADER.size else None
+        if messages is None:
+            logger.debug(f'Dropped malformed datagram of {len(datagram)} bytes')
+            self.dropped += 1
+            return
+        seq, ack, ack_bits = _HEADER.unpack_from(datagram)
+
+        stale = not self._track_remote(seq)
+        self._process_acks(ack, ack_bits)
+        if len(datagram) > _HEADER.size:
+            # pure acks are not acknowledged
+            self._ack_pending = True
+
+        got_reliable = False
+        for reliable_id, payload in messages:
+            if reliable_id is not None:
+                got_reliable = True
+                self._receive_reliable(reliable_id, payload)
+            elif stale:
+                self.dropped += 1
+            else:
+                self._inbox.append(payload)
+
+        if got_reliable:
+            self.update()
+
+    def _track_remote(self, seq: int) -> bool:
+        """
+        Updates ack state, returns False for stale or duplicated datagrams.
+        """
+        if self._remote_seq is None:
+            self._remote_seq = seq
+            return True
+
+        if newer(seq, self._remote_seq):
+            shift = (seq - self._remote_seq) & _SEQ_MASK
+            if shift > _ACK_BITS:
+                self._ack_bits = 0
+            else:
+                self._ack_bits = ((self._ack_bits << shift) | (1 << (shift - 1))) & _SEQ_MASK
+            self._remote_seq = seq
+            return True
+
+        diff = (self._remote_seq - seq) & _SEQ_MASK
+        if 0 < diff <= _ACK_BITS:
+            self._ack_bits |= 1 << (diff - 1)
+        return False
+
+    def _process_acks(self, ack: int, ack_bits: int):
+        if not self._sent:
+            return
+        self._ack(ack)
+        for i in range(_ACK_BITS):
+            if ack_bits & (1 << i):
+                self._ack((ack - i - 1) & _SEQ_MASK)
+
+    def _ack(self, seq: int):
+        if seq == 0:
+            return
+        for reliable_id in self._sent.pop(seq, ()):
+            self._unacked.pop(reliable_id, None)
+
+    def _receive_reliable(self, reliable_id: int, payload: bytes):
+        if reliable_id != self._next_expected_id and not newer(reliable_id, self._next_expected_id):
+            return  # duplicate
+
+        self._reliable_in[reliable_id] = payload
+        while self._next_expected_id in self._reliable_in:
+            self._inbox.append(self._reliable_in.pop(self._next_expected_id))
+            self._next_expected_id = (self._next_expected_id + 1) & _SEQ_MASK
+
+    @property
+    def unacked(self) -> int:
+        return len(self._unacked)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.socket.close()
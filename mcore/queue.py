@@ -1,4 +1,9 @@
+import asyncio
 import heapq
+from itertools import count
+from queue import Empty
+from threading import Condition
+from typing import Iterable, Tuple, Any, Hashable, Optional, Dict, List
 
 
 class PriorityQueue:
@@ -12,8 +17,227 @@ class PriorityQueue:
     def put(self, item):
         heapq.heappush(self._queue, item)
 
+    def put_many(self, items: Iterable):
+        items = list(items)
+        queue = self._queue
+        # heapify is O(n), pushing k items O(k log n)
+        if len(items) > len(queue) // 8:
+            queue.extend(items)
+            heapq.heapify(queue)
+        else:
+            for item in items:
+                heapq.heappush(queue, item)
+
     def get(self):
         return heapq.heappop(self._queue)
 
+    def peek(self):
+        return self._queue[0]
+
     def empty(self):
         return len(self._queue) == 0
+
+    def __len__(self):
+        return len(self._queue)
+
+
+# marks entries of IndexedPriorityQueue, which were removed or updated
+_REMOVED = object()
+
+
+class IndexedPriorityQueue:
+    """
+    Priority queue of unique keys, entries are tuples of the form: (priority number, key).
+    The priority of a key can be updated and keys can be removed in O(log n).
+
+    Updated and removed entries are invalidated in place and skipped by `get`,
+    the heap is rebuilt when more than half of it are invalid entries.
+    Keys with equal priority are retrieved in insertion order.
+    """
+
+    def __init__(self):
+        self._queue: List[list] = []
+        self._entries: Dict[Hashable, list] = {}
+        self._counter = count()
+        self._invalid = 0
+
+    def put(self, item: Tuple[Any, Hashable]):
+        """
+        Adds the key or updates its priority.
+        """
+        priority, key = item
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] == priority:
+                return
+            entry[2] = _REMOVED
+            self._invalid += 1
+        entry = self._entries[key] = [priority, next(self._counter), key]
+        heapq.heappush(self._queue, entry)
+        if self._invalid > 64 and self._invalid > len(self._queue) // 2:
+            self._compact()
+
+    def put_many(self, items: Iterable[Tuple[Any, Hashable]]):
+        entries = self._entries
+        counter = self._counter
+        added = []
+        for priority, key in items:
+            entry = entries.get(key)
+            if entry is not None:
+                entry[2] = _REMOVED
+                self._invalid += 1
+            entry = entries[key] = [priority, next(counter), key]
+            added.append(entry)
+
+        queue = self._queue
+        if len(added) > len(queue) // 8 or self._invalid > len(queue) // 2:
+            queue.extend(added)
+            self._compact()
+        else:
+            for entry in added:
+                heapq.heappush(queue, entry)
+
+    def update_priority(self, key: Hashable, priority):
+        """
+        Raises KeyError, if the key is not queued.
+        """
+        if key not in self._entries:
+            raise KeyError(key)
+        self.put((priority, key))
+
+    def remove(self, key: Hashable):
+        """
+        Raises KeyError, if the key is not queued.
+        """
+        entry = self._entries.pop(key)
+        entry[2] = _REMOVED
+        self._invalid += 1
+
+    def get(self) -> Tuple[Any, Hashable]:
+        queue = self._queue
+        while queue:
+            priority, _, key = heapq.heappop(queue)
+            if key is not _REMOVED:
+                del self._entries[key]
+                return priority, key
+            self._invalid -= 1
+        raise IndexError('get from an empty priority queue')
+
+    def peek(self) -> Tuple[Any, Hashable]:
+        queue = self._queue
+        while queue and queue[0][2] is _REMOVED:
+            heapq.heappop(queue)
+            self._invalid -= 1
+        if not queue:
+            raise IndexError('peek into an empty priority queue')
+        return queue[0][0], queue[0][2]
+
+    def priority(self, key: Hashable):
+        return self._entries[key][0]
+
+    def _compact(self):
+        self._queue = [entry for entry in self._queue if entry[2] is not _REMOVED]
+        heapq.heapify(self._queue)
+        self._invalid = 0
+
+    def empty(self):
+        return len(self._entries) == 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+class _ThreadSafe:
+    """
+    Lock based flavour, `get` blocks until an entry is available.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = Condition()
+
+    def put(self, item):
+        with self._lock:
+            super().put(item)
+            self._lock.notify()
+
+    def put_many(self, items: Iterable):
+        with self._lock:
+            super().put_many(items)
+            self._lock.notify_all()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        """
+        Raises `queue.Empty`, if no entry is available (after `timeout` seconds).
+        """
+        with self._lock:
+            if not self._lock.wait_for(self.__len__, timeout if block else 0):
+                raise Empty
+            return super().get()
+
+    def peek(self):
+        with self._lock:
+            return super().peek()
+
+
+class _Async:
+    """
+    Asyncio flavour, `get` waits until an entry is available. Not thread safe.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._not_empty: Optional[asyncio.Event] = None
+
+    def _notify(self):
+        if self._not_empty is not None:
+            self._not_empty.set()
+
+    def put(self, item):
+        super().put(item)
+        self._notify()
+
+    def put_many(self, items: Iterable):
+        super().put_many(items)
+        self._notify()
+
+    async def get(self):
+        while not len(self):
+            if self._not_empty is None:
+                # created lazily within the running loop
+                self._not_empty = asyncio.Event()
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return super().get()
+
+    def get_nowait(self):
+        return super().get()
+
+
+class ThreadSafePriorityQueue(_ThreadSafe, PriorityQueue):
+    pass
+
+
+class ThreadSafeIndexedPriorityQueue(_ThreadSafe, IndexedPriorityQueue):
+    def update_priority(self, key: Hashable, priority):
+        with self._lock:
+            super().update_priority(key, priority)
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            super().remove(key)
+
+    def priority(self, key: Hashable):
+        with self._lock:
+            return super().priority(key)
+
+
+class AsyncPriorityQueue(_Async, PriorityQueue):
+    pass
+
+
+class AsyncIndexedPriorityQueue(_Async, IndexedPriorityQueue):
+    pass
@@ -0,0 +1,264 @@
+"""
+Timers for game loops and asyncio.
+
+`TimingWheel` is a hierarchical timing wheel with O(1) schedule and cancel,
+`HeapScheduler` the same interface on top of `mcore.queue.IndexedPriorityQueue` (O(log n)).
+
+wheel = TimingWheel(resolution=0.01)
+timer = wheel.call_later(1.5, respawn, player)
+timer.cancel()
+
+# game loop
+def on_update(self, delta_time):
+    wheel.run()
+
+# asyncio
+asyncio.ensure_future(wheel.serve())
+
+python -m mcore.scheduler compares both with many mostly cancelled timers.
+"""
+import argparse
+import asyncio
+import logging
+import math
+import random
+import time
+from typing import Callable, List, Optional, Dict
+
+from mcore.queue import IndexedPriorityQueue
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    __slots__ = ('when', 'callback', 'args', '_slot', '_scheduler')
+
+    def __init__(self, when: float, callback: Callable, args: tuple):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self._slot: Optional[Dict] = None
+        self._scheduler = None
+
+    def __call__(self):
+        return self.callback(*self.args)
+
+    @property
+    def active(self) -> bool:
+        return self._scheduler is not None
+
+    def cancel(self) -> bool:
+        """
+        Returns False, if the timer already expired or was cancelled.
+        """
+        scheduler = self._scheduler
+        if scheduler is None:
+            return False
+        scheduler._cancel(self)
+        self._scheduler = None
+        return True
+
+
+class _Scheduler:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+
+    def call_at(self, when: float, callback: Callable, *args) -> Timer:
+        timer = Timer(when, callback, args)
+        timer._scheduler = self
+        self._schedule(timer)
+        return timer
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Timer:
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def _schedule(self, timer: Timer):
+        raise NotImplementedError()
+
+    def _cancel(self, timer: Timer):
+        raise NotImplementedError()
+
+    def tick(self, now: Optional[float] = None) -> List[Timer]:
+        """
+        Returns the timers expired until `now` (default: clock), ordered by expiry at the resolution of the scheduler.
+        """
+        raise NotImplementedError()
+
+    def run(self, now: Optional[float] = None) -> int:
+        """
+        Calls the expired timers, returns their number.
+        Errors of callbacks are logged, the other timers of the batch are still called.
+        """
+        timers = self.tick(now)
+        for timer in timers:
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                logger.exception(f'Timer callback {timer.callback!r} failed')
+        return len(timers)
+
+    async def serve(self, interval: float = 0.01):
+        """
+        Runs expired timers every `interval` seconds until cancelled.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.run()
+
+
+class TimingWheel(_Scheduler):
+    """
+    Hierarchical timing wheel, `levels` wheels of `slots` slots,
+    slots of level n cover resolution * slots**n seconds.
+
+    Timers expire in the first `tick` at or after their time rounded up to the resolution.
+    Timers beyond the range of the top level are rescheduled when their slot is reached.
+    """
+
+    def __init__(self, resolution: float = 0.01, slots: int = 256, levels: int = 4,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__(clock)
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self._start = clock()
+        self._tick = 0
+        self._size = 0
+        # slots are dicts used as ordered sets, timers remove themselves on cancel
+        self._wheels: List[List[Dict[Timer, None]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+
+    def __len__(self):
+        return self._size
+
+    def _schedule(self, timer: Timer):
+        self._size += 1
+        self._insert(timer, max(self._ticks(timer.when), self._tick + 1))
+
+    def _ticks(self, when: float) -> int:
+        return math.ceil((when - self._start) / self.resolution)
+
+    def _insert(self, timer: Timer, tick: int):
+        delta = tick - self._tick
+        slots = self.slots
+        span = slots
+        level = 0
+        while delta >= span and level < self.levels - 1:
+            span *= slots
+            level += 1
+        if delta >= span:
+            # beyond the top level, reinserted when reached
+            tick = self._tick + span - 1
+        slot = self._wheels[level][(tick * slots // span) % slots]
+        slot[timer] = None
+        timer._slot = slot
+
+    def _cancel(self, timer: Timer):
+        del timer._slot[timer]
+        timer._slot = None
+        self._size -= 1
+
+    def _cascade(self, level: int, index: int):
+        slot = self._wheels[level][index]
+        if not slot:
+            return
+        self._wheels[level][index] = {}
+        for timer in slot:
+            self._insert(timer, max(self._ticks(timer.when), self._tick))
+
+    def tick(self, now: Optional[float] = None) -> List[Timer]:
+        if now is None:
+            now = self.clock()
+        target = int((now - self._start) / self.resolution)
+        expired = []
+        if self._size == 0:
+            self._tick = max(self._tick, target)
+            return expired
+
+        slots = self.slots
+        wheel = self._wheels[0]
+        while self._tick < target and self._size:
+            self._tick += 1
+            index = self._tick % slots
+            if index == 0:
+                position = self._tick
+                for level in range(1, self.levels):
+                    position //= slots
+                    self._cascade(level, position % slots)
+                    if position % slots:
+                        break
+
+            slot = wheel[index]
+            if slot:
+                wheel[index] = {}
+                for timer in slot:
+                    timer._slot = None
+                    timer._scheduler = None
+                expired.extend(slot)
+                self._size -= len(slot)
+        self._tick = max(self._tick, target)
+        return expired
+
+
+class HeapScheduler(_Scheduler):
+    """
+    Same interface as `TimingWheel` based on a priority queue, exact expiry times, O(log n) operations.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        super().__init__(clock)
+        self._queue = IndexedPriorityQueue()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _schedule(self, timer: Timer):
+        self._queue.put((timer.when, timer))
+
+    def _cancel(self, timer: Timer):
+        self._queue.remove(timer)
+
+    def tick(self, now: Optional[float] = None) -> List[Timer]:
+        if now is None:
+            now = self.clock()
+        queue = self._queue
+        expired = []
+        while len(queue) and queue.peek()[0] <= now:
+            _, timer = queue.get()
+            timer._scheduler = None
+            expired.append(timer)
+        return expired
+
+
+def bench(scheduler: _Scheduler, timers: int, cancel: float, seed: int = 1) -> float:
+    """
+    Schedules timers over 10 simulated seconds, cancels a fraction and ticks at 60 fps.
+    """
+    rnd = random.Random(seed)
+    noop = lambda: None
+    start = time.perf_counter()
+    now = scheduler.clock()
+    handles = [scheduler.call_at(now + rnd.uniform(0, 10), noop) for _ in range(timers)]
+    for handle in handles:
+        if rnd.random() < cancel:
+            handle.cancel()
+    frame = now
+    while len(scheduler):
+        frame += 1 / 60
+        scheduler.run(frame)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare TimingWheel and HeapScheduler')
+    parser.add_argument('--timers', nargs='+', type=int, default=[10_000, 100_000])
+    parser.add_argument('--cancel', type=float, default=0.9, help='fraction of cancelled timers')
+    args = parser.parse_args(argv)
+
+    for timers in args.timers:
+        wheel = bench(TimingWheel(resolution=1 / 60, clock=lambda: 0.0), timers, args.cancel)
+        heap = bench(HeapScheduler(clock=lambda: 0.0), timers, args.cancel)
+        print(f'{timers:>8} timers, {args.cancel:.0%} cancelled: wheel {wheel * 1000:8.1f}ms, heap {heap * 1000:8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
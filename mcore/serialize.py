@@ -1,6 +1,31 @@
+import codecs
 import dataclasses
+import io
+import json
+import re
 from datetime import datetime
+from enum import Enum
 from json.encoder import JSONEncoder
+from typing import Any, Callable, Dict, Type, TypeVar, Union, get_type_hints, Iterable, Iterator
+
+T = TypeVar('T')
+
+_ENCODERS: Dict[type, Callable[[Any], dict]] = {}
+_DECODERS: Dict[Any, Callable[[Any], Any]] = {}
+
+
+def dataclass_encoder(cls: type) -> Callable[[Any], dict]:
+    """
+    Returns a cached function, which converts an instance of the dataclass into a dict of its fields.
+    Unlike `dataclasses.asdict` nested values are not copied, the json encoder handles them on its own.
+    """
+    encoder = _ENCODERS.get(cls)
+    if encoder is None:
+        items = ', '.join(f'{field.name!r}: o.{field.name}' for field in dataclasses.fields(cls))
+        namespace = {}
+        exec(f'def encode(o):\n    return {{{items}}}', namespace)
+        encoder = _ENCODERS[cls] = namespace['encode']
+    return encoder
 
 
 class EnhancedJSONEncoder(JSONEncoder):
@@ -8,8 +33,287 @@ class EnhancedJSONEncoder(JSONEncoder):
     json.dumps(datetime.today(), cls=EnhancedJSONEncoder)
     """
     def default(self, o):
-        if dataclasses.is_dataclass(o):
-            return dataclasses.asdict(o)
+        encoder = _ENCODERS.get(type(o))
+        if encoder is not None:
+            return encoder(o)
+        if dataclasses.is_dataclass(o) and not isinstance(o, type):
+            return dataclass_encoder(type(o))(o)
         elif isinstance(o, datetime):
             return o.isoformat()
         return super().default(o)
+
+
+def _identity(data):
+    return data
+
+
+def _dataclass_decoder(cls: type) -> Callable[[Any], Any]:
+    fields = []
+
+    def decode(data):
+        if data is None or isinstance(data, cls):
+            return data
+        return cls(**{name: field_decoder(data[name]) for name, field_decoder in fields if name in data})
+
+    # registered before resolving fields, to support recursive dataclasses
+    _DECODERS[cls] = decode
+    try:
+        hints = get_type_hints(cls)
+        fields.extend((f.name, decoder(hints.get(f.name, Any))) for f in dataclasses.fields(cls) if f.init)
+    except Exception:
+        # e.g. NameError of an unresolvable forward reference, the next call retries
+        _DECODERS.pop(cls, None)
+        raise
+    return decode
+
+
+def _build_decoder(tp) -> Callable[[Any], Any]:
+    if tp is datetime:
+        return lambda data: datetime.fromisoformat(data) if isinstance(data, str) else data
+    if isinstance(tp, type) and dataclasses.is_dataclass(tp):
+        return _dataclass_decoder(tp)
+    if isinstance(tp, type) and issubclass(tp, Enum):
+        return lambda data: tp(data) if data is not None else None
+
+    origin = getattr(tp, '__origin__', None)
+    args = [arg for arg in getattr(tp, '__args__', None) or () if not isinstance(arg, TypeVar)]
+    if origin is Union:
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) == 1:
+            inner = decoder(options[0])
+            if inner is _identity:
+                return _identity
+            return lambda data: None if data is None else inner(data)
+        return _identity
+
+    if origin in (list, set, frozenset) and args:
+        inner = decoder(args[0])
+        if inner is _identity and origin is list:
+            return _identity
+        return lambda data: origin(inner(value) for value in data)
+    if origin is tuple and args:
+        if len(args) == 2 and args[1] is Ellipsis:
+            inner = decoder(args[0])
+            return lambda data: tuple(inner(value) for value in data)
+        inners = [decoder(arg) for arg in args]
+        return lambda data: tuple(inner(value) for inner, value in zip(inners, data))
+    if origin is dict and len(args) == 2:
+        inner = decoder(args[1])
+        if inner is _identity:
+            return _identity
+        return lambda data: {key: inner(value) for key, value in data.items()}
+    return _identity
+
+
+def decoder(tp) -> Callable[[Any], Any]:
+    """
+    Returns a cached function, which rebuilds values of type `tp` (dataclasses, datetimes, enums
+    and containers of them, based on type hints) from parsed json.
+    """
+    result = _DECODERS.get(tp)
+    if result is None:
+        result = _DECODERS[tp] = _build_decoder(tp)
+    return result
+
+
+def from_json(data: Any, tp: Type[T]) -> T:
+    """
+    from_json(json.loads(text), List[MyDataclass])
+    """
+    return decoder(tp)(data)
+
+
+def loads(text: Union[str, bytes], tp: Type[T]) -> T:
+    return decoder(tp)(json.loads(text))
+
+
+# --- streaming
+BUFFER_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+
+def _buffered(pieces: Iterable[str], buffer_size: int) -> Iterator[str]:
+    batch = []
+    size = 0
+    for piece in pieces:
+        batch.append(piece)
+        size += len(piece)
+        if size >= buffer_size:
+            yield ''.join(batch)
+            batch.clear()
+            size = 0
+    if batch:
+        yield ''.join(batch)
+
+
+def iterencode_lines(items: Iterable, cls=EnhancedJSONEncoder, buffer_size: int = BUFFER_SIZE,
+                     **kwargs) -> Iterator[str]:
+    """
+    Encodes items as JSON Lines, yields chunks of about `buffer_size` characters.
+    """
+    encode = cls(**kwargs).encode
+    return _buffered((encode(item) + '\n' for item in items), buffer_size)
+
+
+def iterencode_array(items: Iterable, cls=EnhancedJSONEncoder, buffer_size: int = BUFFER_SIZE,
+                     **kwargs) -> Iterator[str]:
+    """
+    Encodes items as a json array, yields chunks of about `buffer_size` characters.
+    """
+    encode = cls(**kwargs).encode
+
+    def pieces():
+        separator = '['
+        for item in items:
+            yield separator + encode(item)
+            separator = ', '
+        yield ']' if separator == ', ' else '[]'
+
+    return _buffered(pieces(), buffer_size)
+
+
+def _writer(target) -> Callable[[str], Any]:
+    if hasattr(target, 'sendall'):
+        return lambda chunk: target.sendall(chunk.encode())
+    if isinstance(target, io.TextIOBase):
+        return target.write
+    return lambda chunk: target.write(chunk.encode())
+
+
+def dump_lines(items: Iterable, target, cls=EnhancedJSONEncoder, buffer_size: int = BUFFER_SIZE, **kwargs):
+    """
+    Writes items as JSON Lines to a text or binary file or a socket, holding at most about `buffer_size` characters.
+    """
+    write = _writer(target)
+    for chunk in iterencode_lines(items, cls, buffer_size, **kwargs):
+        write(chunk)
+
+
+def dump_array(items: Iterable, target, cls=EnhancedJSONEncoder, buffer_size: int = BUFFER_SIZE, **kwargs):
+    """
+    Like `dump_lines`, but writes a json array.
+    """
+    write = _writer(target)
+    for chunk in iterencode_array(items, cls, buffer_size, **kwargs):
+        write(chunk)
+
+
+def _chunks(source, size: int) -> Iterator[str]:
+    read = source.recv if hasattr(source, 'recv') else source.read
+    utf8 = None
+    while True:
+        chunk = read(size)
+        if not chunk:
+            break
+        if not isinstance(chunk, str):
+            if utf8 is None:
+                utf8 = codecs.getincrementaldecoder('utf-8')()
+            chunk = utf8.decode(chunk)
+        yield chunk
+    if utf8 is not None:
+        tail = utf8.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+def _converter(tp) -> Callable[[Any], Any]:
+    return _identity if tp is None else decoder(tp)
+
+
+def iter_lines(source, tp=None, buffer_size: int = BUFFER_SIZE) -> Iterator:
+    """
+    Lazily parses JSON Lines from a text or binary file or a socket,
+    records are rebuilt as `tp` (see `from_json`) if given.
+    """
+    convert = _converter(tp)
+    pending = []
+    for chunk in _chunks(source, buffer_size):
+        if '\n' not in chunk:
+            pending.append(chunk)
+            continue
+        pending.append(chunk)
+        lines = ''.join(pending).split('\n')
+        pending = [lines.pop()]
+        for line in lines:
+            if line.strip():
+                yield convert(json.loads(line))
+    line = ''.join(pending)
+    if line.strip():
+        yield convert(json.loads(line))
+
+
+class _TextBuffer:
+    def __init__(self, chunks: Iterator[str]):
+        self.chunks = chunks
+        self.buf = ''
+        self.pos = 0
+        self._raw_decode = json.JSONDecoder().raw_decode
+
+    def more(self, size: int = 1) -> bool:
+        """
+        Drops consumed text and appends at least `size` characters, returns False at the end of the stream.
+        """
+        added = [self.buf[self.pos:]]
+        needed = size
+        while needed > 0:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            added.append(chunk)
+            needed -= len(chunk)
+        if len(added) == 1:
+            return False
+        self.buf = ''.join(added)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Returns the next non whitespace character or '' at the end of the stream.
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                return ''
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # incomplete value, read at least as much again to keep reparsing linear
+                if self.more(max(1, len(self.buf) - self.pos)):
+                    continue
+                raise
+            # a number could continue in the next chunk
+            if (isinstance(value, (int, float)) and self.buf[end:end + 1] in ('', '.', 'e', 'E')
+                    and self.more(len(self.buf) - self.pos + 1)):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_array(source, tp=None, buffer_size: int = BUFFER_SIZE) -> Iterator:
+    """
+    Lazily parses the elements of a top level json array from a text or binary file or a socket,
+    elements are rebuilt as `tp` (see `from_json`) if given.
+    """
+    convert = _converter(tp)
+    buffer = _TextBuffer(_chunks(source, buffer_size))
+    if buffer.peek() != '[':
+        raise ValueError('Expected a json array')
+    buffer.pos += 1
+    if buffer.peek() == ']':
+        return
+    while True:
+        yield convert(buffer.value())
+        char = buffer.peek()
+        buffer.pos += 1
+        if char == ']':
+            return
+        if char != ',':
+            raise ValueError(f'Expected "," or "]" in json array, got {char!r}')